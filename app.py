@@ -1,6 +1,7 @@
+import re
 import streamlit as st
 
-from utils.llm import generate_text
+from utils.llm import generate_text, TRUNCATED_WARNING
 from utils.places_osm import (
     search_cities,
     clean_city_name,
@@ -9,8 +10,29 @@ from utils.places_osm import (
     get_city_categories,
     get_nearby_day_trips,
 )
-from utils.prompt_builder import build_prompt
-from utils.export_pdf import generate_pdf_bytes
+from utils.prompt_builder import (
+    build_prompt,
+    build_structured_prompt,
+    structured_places,
+    STATIC_PREFIX,
+    PREFIX_HASH,
+    STRUCTURED_PREFIX_HASH,
+)
+from utils.itinerary import generate_structured_plan
+from utils.plan_history import (
+    get_plan_store,
+    output_key,
+    get_output,
+    put_output,
+    save_plan,
+    load_plan,
+    get_plan_pdf,
+    session_history,
+)
+from utils.estimates import estimate_sections, merge_sections
+from utils.multi_city import generate_circuit
+from utils.prefetch import start_prefetch, get_prefetch
+from utils.place_cache import get_place_cache, capture_status
 
 from utils.travel_time import (
     haversine_km,
@@ -34,9 +56,9 @@ st.write(
     "Generates itinerary, transport plan, budget estimation, food & tips."
 )
 
-# Initialize session storage for generated plan
-if "last_plan" not in st.session_state:
-    st.session_state["last_plan"] = ""
+# Initialize session storage for generated plans (ids + labels; texts live in utils/plan_history.py)
+if "plan_history" not in st.session_state:
+    st.session_state["plan_history"] = []
 
 
 # ----------------------------------------------------
@@ -72,8 +94,29 @@ if dep_suggestions:
 else:
     departure_full = dep_query
 
+# Start fetching generation data in the background as soon as the selection settles
+start_prefetch(destination_city, departure_full)
+
 days = st.sidebar.slider("Number of Days", 1, 10, 5)
 
+# Multi-city circuit: destination above is the first stop
+st.sidebar.subheader("🗺️ Multi-city circuit (Optional)")
+multi_city = st.sidebar.checkbox("Add more stops after the destination")
+circuit_stops = []
+
+if multi_city:
+    stops_query = st.sidebar.text_input(
+        "Next stops in order (comma-separated)",
+        placeholder="e.g. Gokarna, Hampi"
+    )
+    for i, stop in enumerate([x.strip() for x in stops_query.split(",") if x.strip()]):
+        stop_matches = search_cities(stop)
+        stop_full = stop_matches[0] if stop_matches else stop
+        stop_days = st.sidebar.number_input(
+            f"Days in {clean_city_name(stop_full)}", min_value=1, max_value=10, value=2, key=f"stop_days_{i}"
+        )
+        circuit_stops.append((stop_full, int(stop_days)))
+
 budget = st.sidebar.selectbox("Budget Level", ["Low", "Medium", "High"])
 
 currency = st.sidebar.text_input(
@@ -91,6 +134,23 @@ interests = st.sidebar.multiselect(
 
 temperature = st.sidebar.slider("Creativity (Temperature)", 0.0, 1.0, 0.7, 0.1)
 
+structured_mode = st.sidebar.checkbox(
+    "Validated itinerary (structured output)",
+    value=False,
+    disabled=bool(circuit_stops),
+    help="Checks every day against the fetched places and regenerates only the days/sections that fail."
+)
+if circuit_stops:
+    # multi-city legs are generated as plain text (utils/multi_city.py)
+    structured_mode = False
+    st.sidebar.caption("ℹ️ Validated itinerary is not available for multi-city circuits.")
+
+reuse_plans = st.sidebar.checkbox(
+    "Reuse identical earlier plans",
+    value=True,
+    help="Skips the LLM call when exactly this request was already generated (in any session)."
+)
+
 
 # ----------------------------------------------------
 # Main UI
@@ -102,6 +162,8 @@ with col1:
     st.write(f"**Destination:** {destination_full if destination_full else '-'}")
     st.write(f"**Departure:** {departure_full if departure_full else '-'}")
     st.write(f"**Days:** {days}")
+    if circuit_stops:
+        st.write(f"**Next stops:** {', '.join(f'{clean_city_name(f)} ({d}d)' for f, d in circuit_stops)}")
     st.write(f"**Budget:** {budget}")
     st.write(f"**Currency:** {currency.strip().upper() if currency else 'INR'}")
     st.write(f"**Travel type:** {travel_type}")
@@ -113,8 +175,8 @@ with col2:
 
     if destination_city and len(destination_city) >= 2:
         with st.spinner("Fetching places..."):
-            city_categories = get_city_categories(destination_city, radius_m=40000, limit_each=8)
-            nearby_trips = get_nearby_day_trips(destination_city, radius_m=200000, limit_each=8)
+            city_categories = get_city_categories(destination_city, radius_m=40000, limit_each=8, adaptive=True)
+            nearby_trips = get_nearby_day_trips(destination_city, radius_m=200000, limit_each=8, adaptive=True)
 
         found_any = False
 
@@ -148,79 +210,212 @@ if st.button("🚀 Generate Travel Plan"):
         st.warning("Please enter/select a destination.")
     else:
         try:
-            # ✅ UNIVERSAL Travel time hint (any cities)
-            travel_time_hint = "Not available"
-
-            if departure_full and destination_city:
-                dep_coords = geocode_city(departure_full)
-                dest_coords = geocode_city(destination_city)
-
-                if dep_coords and dest_coords:
-                    dist_km = haversine_km(dep_coords[0], dep_coords[1], dest_coords[0], dest_coords[1])
-                    low, high, mode = estimate_travel_time(dist_km, transport_pref)
-                    travel_time_hint = f"{mode}: approx {format_hours_range(low, high)} (distance ~{dist_km:.0f} km)"
-
-            with st.spinner("Preparing travel data..."):
-                attractions = get_attractions_osm(destination_city, limit=12, radius_m=20000)
-                if not attractions:
-                    attractions = get_attractions_osm(destination_city, limit=12, radius_m=50000)
-
-                city_categories = get_city_categories(destination_city, radius_m=40000, limit_each=8)
-                nearby_trips = get_nearby_day_trips(destination_city, radius_m=200000, limit_each=8)
-
-                # ✅ pass travel_time_hint into prompt
-                prompt = build_prompt(
-                    destination_full=destination_full,
-                    destination_city=destination_city,
-                    departure_full=departure_full,
-                    days=days,
-                    budget=budget,
-                    currency=currency,
-                    travel_type=travel_type,
-                    transport_pref=transport_pref,
-                    interests=interests,
-                    attractions=attractions,
-                    city_categories=city_categories,
-                    nearby_trips=nearby_trips,
-                    travel_time_hint=travel_time_hint,  # ✅ NEW
+            if circuit_stops:
+                stops = [(destination_full, days)] + circuit_stops
+                key = output_key(
+                    "circuit", PREFIX_HASH, stops, departure_full, budget, currency,
+                    travel_type, transport_pref, sorted(interests), temperature,
                 )
-
-            with st.spinner("Generating travel plan with LLM..."):
-                output_text = generate_text(
-                    prompt=prompt,
-                    temperature=temperature,
-                    max_new_tokens=1200
+                cached_output = get_output(key) if reuse_plans else None
+
+                if cached_output:
+                    plan_text = cached_output
+                    st.info("♻️ Reused an identical earlier plan (no LLM call).")
+                else:
+                    with st.spinner("Fetching places for every stop and generating all legs..."), \
+                            capture_status() as llm_status:
+                        plan_text = generate_circuit(
+                            stops=stops,
+                            departure_full=departure_full,
+                            budget=budget,
+                            currency=currency,
+                            travel_type=travel_type,
+                            transport_pref=transport_pref,
+                            interests=interests,
+                            temperature=temperature,
+                            max_new_tokens=1200,
+                        )
+                    # a cut-off plan is shown but not offered for reuse
+                    if ("warning", TRUNCATED_WARNING) not in llm_status:
+                        put_output(key, plan_text)
+
+                # plain "->": the PDF title is latin-1 only
+                route = " -> ".join([destination_city] + [clean_city_name(f) for f, _ in circuit_stops])
+                total_days = days + sum(d for _, d in circuit_stops)
+            else:
+                # ✅ UNIVERSAL Travel time hint (any cities)
+                travel_time_hint = "Not available"
+                dist_km = None
+                prefetch = get_prefetch(destination_city, departure_full)
+
+                if departure_full and destination_city:
+                    if prefetch:
+                        dep_coords = prefetch.result("dep_coords")
+                        dest_coords = prefetch.result("dest_coords")
+                    else:
+                        dep_coords = geocode_city(departure_full)
+                        dest_coords = geocode_city(destination_city)
+
+                    if dep_coords and dest_coords:
+                        dist_km = haversine_km(dep_coords[0], dep_coords[1], dest_coords[0], dest_coords[1])
+                        low, high, mode = estimate_travel_time(dist_km, transport_pref)
+                        travel_time_hint = f"{mode}: approx {format_hours_range(low, high)} (distance ~{dist_km:.0f} km)"
+
+                with st.spinner("Preparing travel data..."):
+                    if prefetch:
+                        attractions = prefetch.result("attractions")
+                    else:
+                        attractions = get_attractions_osm(destination_city, limit=12, radius_m=50000, adaptive=True)
+
+                    city_categories = get_city_categories(destination_city, radius_m=40000, limit_each=8, adaptive=True)
+                    nearby_trips = get_nearby_day_trips(destination_city, radius_m=200000, limit_each=8, adaptive=True)
+
+                    # ✅ pass travel_time_hint into prompt
+                    prompt_fn = build_structured_prompt if structured_mode else build_prompt
+                    prompt = prompt_fn(
+                        destination_full=destination_full,
+                        destination_city=destination_city,
+                        departure_full=departure_full,
+                        days=days,
+                        budget=budget,
+                        currency=currency,
+                        travel_type=travel_type,
+                        transport_pref=transport_pref,
+                        interests=interests,
+                        attractions=attractions,
+                        city_categories=city_categories,
+                        nearby_trips=nearby_trips,
+                        travel_time_hint=travel_time_hint,  # ✅ NEW
+                    )
+
+                    # Transport + budget are computed locally instead of by the LLM
+                    local_sections = estimate_sections(
+                        destination_full=destination_full,
+                        days=days,
+                        budget=budget,
+                        currency=currency,
+                        travel_type=travel_type,
+                        transport_pref=transport_pref,
+                        distance_km=dist_km,
+                    )
+
+                key = output_key(
+                    STRUCTURED_PREFIX_HASH if structured_mode else PREFIX_HASH, prompt, temperature, 1200,
                 )
-
-            st.session_state["last_plan"] = output_text
+                cached_output = get_output(key) if reuse_plans else None
+                problems, llm_status = [], []
+
+                if cached_output:
+                    output_text = cached_output
+                    st.info("♻️ Reused an identical earlier plan (no LLM call).")
+                elif structured_mode:
+                    preview = st.empty()
+
+                    def show_partial(plan):
+                        preview.markdown(plan.to_markdown())
+
+                    with st.spinner("Generating validated travel plan with LLM..."), \
+                            capture_status() as llm_status:
+                        plan, problems = generate_structured_plan(
+                            prompt=prompt,
+                            destination_city=destination_city,
+                            days=days,
+                            currency=currency,
+                            allowed_places=structured_places(attractions, city_categories, nearby_trips),
+                            temperature=temperature,
+                            max_new_tokens=1200,
+                            on_update=show_partial,
+                        )
+                    preview.empty()
+
+                    if problems:
+                        st.warning(
+                            "⚠️ Some parts could not be validated: "
+                            + "; ".join(f"{'Day ' + str(k) if isinstance(k, int) else k} ({r})" for k, r in problems)
+                        )
+
+                    output_text = plan.to_markdown()
+                else:
+                    with st.spinner("Generating travel plan with LLM..."), capture_status() as llm_status:
+                        output_text = generate_text(
+                            prompt=prompt,
+                            temperature=temperature,
+                            max_new_tokens=1200,
+                            system=STATIC_PREFIX
+                        )
+
+                # truncated or partly invalid plans are shown but not offered for reuse
+                if not cached_output and not problems and ("warning", TRUNCATED_WARNING) not in llm_status:
+                    put_output(key, output_text)
+
+                plan_text = merge_sections(output_text, local_sections)
+                route = destination_city
+                total_days = days
+
+            label = f"{route} · {total_days}d · {budget} · {travel_type} · T={temperature}"
+            st.session_state["plan_pick"] = save_plan(
+                plan_text, title=f"AI Travel Plan - {route}", label=label
+            )
 
         except Exception as e:
-            st.error("Generation failed. Check HF token / model access / rate limits.")
+            st.error("Generation failed. Check LLM backend config (HF token / local server) / rate limits.")
             st.code(str(e))
 
 
 # ----------------------------------------------------
 # Display Plan + Download PDF
 # ----------------------------------------------------
-if st.session_state["last_plan"]:
+history = session_history()
+if history:
     st.subheader("✅ AI Travel Plan")
-    plan_text = st.session_state["last_plan"]
 
-    st.markdown(plan_text)
+    entries = history[::-1]
+    if st.session_state.get("plan_pick") not in entries:
+        st.session_state["plan_pick"] = entries[0]
 
-    pdf_bytes = generate_pdf_bytes(
-        title=f"AI Travel Plan - {destination_city}",
-        content=plan_text
+    plan_id, _ = st.selectbox(
+        "🕘 Plan history (this session)",
+        entries,
+        format_func=lambda entry: entry[1],
+        key="plan_pick",
     )
 
-    st.download_button(
-        label="📄 Download Travel Plan as PDF",
-        data=pdf_bytes,
-        file_name=f"travel_plan_{destination_city.replace(' ', '_').lower()}.pdf",
-        mime="application/pdf"
-    )
+    stored = load_plan(plan_id)
+    if stored is None:
+        st.warning("This plan is no longer stored. Please generate it again.")
+    else:
+        title, plan_text = stored
+
+        st.markdown(plan_text)
+
+        pdf_bytes = get_plan_pdf(plan_id, title, plan_text)
+        route = title.split(" - ", 1)[-1]
+
+        st.download_button(
+            label="📄 Download Travel Plan as PDF",
+            data=pdf_bytes,
+            file_name=f"travel_plan_{re.sub(r'[^a-z0-9]+', '_', route.lower()).strip('_')}.pdf",
+            mime="application/pdf"
+        )
 
 st.markdown("---")
 st.caption(
     "⚠️ Costs/timings are approximate. Places are fetched using OpenStreetMap (Nominatim + Overpass API)."
 )
+
+
+# ----------------------------------------------------
+# Cache usage
+# ----------------------------------------------------
+cache_stats = get_place_cache().stats()
+st.sidebar.caption(
+    f"🧠 Place cache: {cache_stats['entries']} entries, "
+    f"{cache_stats['bytes'] / 1024 / 1024:.1f}/{cache_stats['max_bytes'] / 1024 / 1024:.0f} MB, "
+    f"{cache_stats['hit_rate']:.0%} hits"
+)
+
+store_stats = get_plan_store().stats()
+st.sidebar.caption(
+    f"🕘 Plan store: {store_stats['entries']} entries, "
+    f"{store_stats['bytes'] / 1024 / 1024:.1f}/{store_stats['max_bytes'] / 1024 / 1024:.0f} MB"
+)
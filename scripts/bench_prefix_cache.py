@@ -0,0 +1,105 @@
+"""
+Time-to-first-token benchmark: old prompt layout (per-trip values first)
+vs. the static-prefix layout from utils/prompt_builder.py.
+
+Needs a local OpenAI-compatible server with prompt caching, e.g.:
+    llama-server -m llama-3.1-8b-instruct-Q4_K_M.gguf --parallel 1 --cont-batching
+
+Usage:
+    python scripts/bench_prefix_cache.py --url http://127.0.0.1:8080 --runs 10
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.llm import LocalBackend  # noqa: E402
+from utils.prompt_builder import (  # noqa: E402
+    SYSTEM_MESSAGE,
+    STATIC_PREFIX,
+    PREFIX_HASH,
+    build_prompt,
+)
+
+CITIES = ["Goa", "Jaipur", "Hampi", "Munnar", "Varanasi", "Rishikesh", "Udaipur", "Puri"]
+PLACES = ["Fort", "Lake", "Temple Complex", "Old Market", "Viewpoint", "Palace", "Ghat", "Caves"]
+
+
+def random_trip(rng: random.Random) -> str:
+    city = rng.choice(CITIES)
+    places = [f"{city} {p}" for p in rng.sample(PLACES, 5)]
+    return build_prompt(
+        destination_full=f"{city}, India",
+        destination_city=city,
+        departure_full=rng.choice(CITIES) + ", India",
+        days=rng.randint(1, 10),
+        budget=rng.choice(["Low", "Medium", "High"]),
+        currency=rng.choice(["INR", "USD", "EUR"]),
+        travel_type=rng.choice(["Solo", "Family", "Friends"]),
+        transport_pref=rng.choice(["Any", "Flight", "Train", "Bus"]),
+        interests=rng.sample(["Nature", "Food", "Adventure", "Culture", "Relaxation"], 2),
+        attractions=places,
+        city_categories={"Culture / History 🏛️": places[:3]},
+        nearby_trips={"Special Places ✨": places[3:]},
+        travel_time_hint=f"Train: approx {rng.randint(2, 20)}.0 hours",
+    )
+
+
+def legacy_messages(trip: str):
+    # old layout: trip values first, static rules/format after them
+    rules = STATIC_PREFIX[len(SYSTEM_MESSAGE):].strip()
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": trip + "\n\n" + rules},
+    ]
+
+
+def prefix_messages(trip: str):
+    return [
+        {"role": "system", "content": STATIC_PREFIX},
+        {"role": "user", "content": trip},
+    ]
+
+
+def time_to_first_token(backend: LocalBackend, messages) -> float:
+    start = time.perf_counter()
+    for delta, _ in backend.stream_chat(messages, temperature=0.0, max_tokens=8):
+        if delta:
+            return time.perf_counter() - start
+    return time.perf_counter() - start
+
+
+def run(backend: LocalBackend, build_messages, runs: int, seed: int) -> list:
+    rng = random.Random(seed)
+    time_to_first_token(backend, build_messages(random_trip(rng)))  # warm-up
+    return [time_to_first_token(backend, build_messages(random_trip(rng))) for _ in range(runs)]
+
+
+def report(name: str, samples: list):
+    samples = sorted(samples)
+    p90 = samples[min(len(samples) - 1, int(len(samples) * 0.9))]
+    print(f"{name:<16} median {statistics.median(samples) * 1000:8.1f} ms   p90 {p90 * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.environ.get("LOCAL_LLM_URL", "http://127.0.0.1:8080"))
+    parser.add_argument("--model", default=os.environ.get("LOCAL_LLM_MODEL", "local"))
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backend = LocalBackend(base_url=args.url, model=args.model, max_parallel=1)
+
+    print(f"Static prefix {PREFIX_HASH}: {len(STATIC_PREFIX)} chars")
+    # same seed -> both layouts see exactly the same trips
+    report("trip-first", run(backend, legacy_messages, args.runs, args.seed))
+    report("static-prefix", run(backend, prefix_messages, args.runs, args.seed))
+
+
+if __name__ == "__main__":
+    main()
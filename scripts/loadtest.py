@@ -0,0 +1,378 @@
+"""
+Multi-session load test for app.py.
+
+Runs N concurrent Streamlit sessions (streamlit.testing AppTest, same process
+and caches as a real pod) through the real flow: type destination ->
+pick suggestion -> type departure -> pick suggestion -> Generate -> PDF.
+Nominatim, Overpass and the LLM are replaced by a local stand-in HTTP server
+with configurable latency, so results measure the app itself.
+
+Usage:
+    python scripts/loadtest.py --sessions 1,4,16 --flows 3
+    python scripts/loadtest.py --sessions 8 --llm-token-ms 20 --overpass-ms 800 --cold
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CITIES = {
+    "Goa, India": (15.49, 73.82),
+    "Gokarna, Uttara Kannada, Karnataka, India": (14.55, 74.31),
+    "Hampi, Vijayanagara, Karnataka, India": (15.33, 76.46),
+    "Delhi, India": (28.61, 77.21),
+    "Mumbai, Maharashtra, India": (19.08, 72.88),
+    "Jaipur, Rajasthan, India": (26.91, 75.79),
+    "Bhubaneswar, Odisha, India": (20.30, 85.82),
+    "Hyderabad, Telangana, India": (17.39, 78.49),
+    "Visakhapatnam, Andhra Pradesh, India": (17.69, 83.22),
+    "Pune, Maharashtra, India": (18.52, 73.86),
+}
+
+PLACE_TAGS = [
+    ("Sands", {"natural": "beach"}),
+    ("Peak", {"natural": "peak"}),
+    ("Viewpoint Hill", {"tourism": "viewpoint"}),
+    ("Falls", {"waterway": "waterfall"}),
+    ("Fort", {"historic": "fort"}),
+    ("Gallery", {"tourism": "museum"}),
+    ("Wonderland", {"tourism": "theme_park"}),
+    ("Monument", {"tourism": "attraction"}),
+]
+PLACE_WORDS = ["Golden", "Silver", "Royal", "Hidden", "Misty", "Old", "Sunset", "Emerald"]
+
+PLAN_TEXT = """## Day-wise Itinerary
+Day {day}: Morning at the Old Fort, afternoon at Golden Sands, evening at Misty Peak viewpoint.
+
+## Transport Plan
+- Inter-city: Train, INR 800-1500
+- Local: Auto-rickshaw and buses
+
+## Estimated Budget Breakdown (INR)
+- Transport: INR 1000-2000
+- Stay: INR 3000-6000
+- Food: INR 1500-3000
+- Activities: INR 500-1500
+- Total: INR 6000-12500
+
+## Food Recommendations
+- Local thali, seafood curry, street snacks
+
+## Travel Tips
+- Carry water, start early, check weather
+"""
+
+
+# ----------------------------------------------------
+# Local stand-ins for Nominatim / Overpass / LLM server
+# ----------------------------------------------------
+class StubHandler(BaseHTTPRequestHandler):
+    config = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path == "/search":
+            time.sleep(self.config["nominatim_ms"] / 1000)
+            q = params.get("q", "").split(",")[0].strip().lower()
+            limit = int(params.get("limit", 8))
+            hits = [
+                {"display_name": name, "lat": str(lat), "lon": str(lon)}
+                for name, (lat, lon) in CITIES.items()
+                if name.lower().startswith(q)
+            ]
+            return self._send_json(hits[:limit])
+
+        if url.path == "/api/interpreter":
+            time.sleep(self.config["overpass_ms"] / 1000)
+            query = params.get("data", "")
+            if "out count" in query:
+                count = self.config["overpass_elements"]
+                return self._send_json({"elements": [{"type": "count", "tags": {"total": str(count)}}]})
+
+            rng = random.Random(query)
+            elements = []
+            for i in range(self.config["overpass_elements"]):
+                kind, tags = PLACE_TAGS[i % len(PLACE_TAGS)]
+                name = f"{rng.choice(PLACE_WORDS)} {kind} {i}"
+                elements.append({"type": "node", "id": i, "tags": dict(tags, name=name)})
+            return self._send_json({"elements": elements})
+
+        self.send_error(404)
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/v1/chat/completions":
+            return self.send_error(404)
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        words = (PLAN_TEXT.format(day=1)).split(" ")
+        words = words[:max(1, int(request.get("max_tokens", len(words))))]
+        token_s = self.config["llm_token_ms"] / 1000
+
+        if not request.get("stream"):
+            time.sleep(token_s * len(words))
+            return self._send_json({
+                "choices": [{"message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}]
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for i, w in enumerate(words):
+            time.sleep(token_s)
+            chunk = {"choices": [{"delta": {"content": (" " if i else "") + w}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        done = {"choices": [{"delta": {}, "finish_reason": "stop"}]}
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+
+
+def start_stub_server(config: dict):
+    StubHandler.config = config
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ----------------------------------------------------
+# One simulated user session
+# ----------------------------------------------------
+def _widget(widgets, label_prefix: str):
+    return next(w for w in widgets if w.label.startswith(label_prefix))
+
+
+def run_flow(app_path: str, rng: random.Random, timeout: float) -> dict:
+    from streamlit.testing.v1 import AppTest
+
+    timings = {}
+    dest, dep = rng.sample(list(CITIES), 2)
+
+    def step(name, fn):
+        start = time.perf_counter()
+        fn()
+        timings.setdefault(name, []).append(time.perf_counter() - start)
+
+    at = AppTest.from_file(app_path, default_timeout=timeout)
+    step("load", at.run)
+
+    # autocomplete: two keystroke commits per field, then pick the suggestion
+    step("type_dest", lambda: _widget(at.text_input, "Type destination").input(dest[:2]).run())
+    step("type_dest", lambda: _widget(at.text_input, "Type destination").input(dest[:3]).run())
+    step("select_dest", lambda: _widget(at.selectbox, "Select destination").select(dest).run())
+    step("type_dep", lambda: _widget(at.text_input, "Type departure").input(dep[:3]).run())
+    step("select_dep", lambda: _widget(at.selectbox, "Select departure").select(dep).run())
+
+    # Generate renders the plan and builds the PDF for the download button
+    step("generate_pdf", lambda: _widget(at.button, "🚀 Generate").click().run())
+
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    if not at.get("download_button"):
+        raise RuntimeError("no PDF download button after Generate")
+
+    return timings
+
+
+def share_runtime_across_sessions():
+    """
+    AppTest installs a mock Runtime singleton for the duration of each run and
+    resets it to None afterwards, which breaks any other session running at the
+    same time. Keep handing out the last installed one instead, so concurrent
+    sessions behave like sessions of one server process.
+    """
+    from streamlit.runtime import Runtime
+
+    last = {}
+
+    def instance(cls):
+        runtime = cls._instance or last.get("runtime")
+        if runtime is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        last["runtime"] = runtime
+        return runtime
+
+    def exists(cls):
+        return cls._instance is not None or "runtime" in last
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+
+
+# ----------------------------------------------------
+# Measurement
+# ----------------------------------------------------
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # ru_maxrss is KB on Linux (peak, not current)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(samples: list, pct: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))]
+
+
+def run_level(app_path: str, sessions: int, flows: int, timeout: float, seed: int) -> dict:
+    from utils.place_cache import get_place_cache
+
+    results, errors = [], []
+    lock = threading.Lock()
+
+    def worker(i):
+        rng = random.Random(seed * 1000 + i)
+        for _ in range(flows):
+            start = time.perf_counter()
+            try:
+                timings = run_flow(app_path, rng, timeout)
+                timings["flow"] = [time.perf_counter() - start]
+                with lock:
+                    results.append(timings)
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+
+    rss_before = rss_mb()
+    cpu_before = time.process_time()
+    wall_start = time.perf_counter()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_before
+
+    steps = {}
+    for timings in results:
+        for name, values in timings.items():
+            steps.setdefault(name, []).extend(values)
+
+    return {
+        "sessions": sessions,
+        "flows_ok": len(results),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "wall_s": wall,
+        "throughput_flows_s": len(results) / wall if wall else 0.0,
+        "cpu_cores": cpu / wall if wall else 0.0,
+        "rss_mb": rss_mb(),
+        "rss_delta_per_session_mb": (rss_mb() - rss_before) / sessions,
+        "place_cache": get_place_cache().stats(),
+        "latency_s": {
+            name: {"p50": percentile(v, 50), "p90": percentile(v, 90), "p99": percentile(v, 99),
+                   "mean": statistics.mean(v)}
+            for name, v in steps.items()
+        },
+    }
+
+
+def print_level(r: dict):
+    print(f"\n=== {r['sessions']} concurrent sessions ===")
+    print(f"flows ok {r['flows_ok']}  errors {r['errors']}  wall {r['wall_s']:.1f}s  "
+          f"throughput {r['throughput_flows_s']:.2f} flows/s")
+    print(f"CPU {r['cpu_cores']:.2f} cores  RSS {r['rss_mb']:.0f} MB  "
+          f"(+{r['rss_delta_per_session_mb']:.1f} MB/session)")
+    pc = r["place_cache"]
+    print(f"place cache {pc['entries']} entries  {pc['bytes'] / 1024:.0f}/{pc['max_bytes'] / 1024:.0f} KB  "
+          f"hit rate {pc['hit_rate']:.0%}  evictions {pc['evictions']}")
+    if r["first_error"]:
+        print(f"first error: {r['first_error']}")
+    print(f"{'step':<14}{'p50':>9}{'p90':>9}{'p99':>9}")
+    for name, lat in r["latency_s"].items():
+        print(f"{name:<14}{lat['p50'] * 1000:>8.0f}ms{lat['p90'] * 1000:>7.0f}ms{lat['p99'] * 1000:>7.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--flows", type=int, default=3, help="full flows per session")
+    parser.add_argument("--timeout", type=float, default=120, help="per script run timeout (s)")
+    parser.add_argument("--nominatim-ms", type=float, default=150)
+    parser.add_argument("--overpass-ms", type=float, default=500)
+    parser.add_argument("--overpass-elements", type=int, default=400)
+    parser.add_argument("--llm-token-ms", type=float, default=10)
+    parser.add_argument("--cold", action="store_true", help="clear st.cache_data, the place cache and the plan store before every level")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    server = start_stub_server({
+        "nominatim_ms": args.nominatim_ms,
+        "overpass_ms": args.overpass_ms,
+        "overpass_elements": args.overpass_elements,
+        "llm_token_ms": args.llm_token_ms,
+    })
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # must be set before the app's modules are imported
+    os.environ.update({
+        "NOMINATIM_URL": f"{base}/search",
+        "OVERPASS_URL": f"{base}/api/interpreter",
+        "LLM_BACKEND": "local",
+        "LOCAL_LLM_URL": base,
+        "GAZETTEER_PATH": "off",
+    })
+
+    import streamlit as st
+    from streamlit import config
+
+    # magic wraps every script run in ast.parse, which is not thread-safe on
+    # CPython 3.11 when many sessions rerun at once; app.py does not use magic
+    config.set_option("runner.magicEnabled", False)
+    share_runtime_across_sessions()
+
+    from utils.place_cache import get_place_cache
+    from utils.plan_history import get_plan_store
+
+    app_path = os.path.join(ROOT, "app.py")
+    levels = [int(x) for x in args.sessions.split(",") if x.strip()]
+    report = []
+
+    for n in levels:
+        if args.cold:
+            st.cache_data.clear()
+            get_place_cache().clear()
+            get_plan_store().clear()
+        r = run_level(app_path, n, args.flows, args.timeout, args.seed)
+        print_level(r)
+        report.append(r)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+from utils.byte_cache import ByteLRUCache, sizeof
+
+
+def _entry_bytes(key, value):
+    return sizeof(value) + sizeof(key)
+
+
+def test_evicts_least_recently_used_entry_over_the_byte_budget():
+    value = ("a" * 100,)
+    cache = ByteLRUCache(max_bytes=2 * _entry_bytes("k1", value))
+    cache.put("k1", value, ttl=60)
+    cache.put("k2", value, ttl=60)
+    assert cache.get("k1") == (True, value)  # k1 is now the most recently used
+
+    cache.put("k3", value, ttl=60)
+
+    assert cache.get("k2") == (False, None)
+    assert cache.get("k1")[0] and cache.get("k3")[0]
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert stats["evictions"] == 1
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+    assert stats["hit_rate"] == 0.75
+
+
+def test_value_larger_than_the_budget_is_not_stored():
+    cache = ByteLRUCache(max_bytes=64)
+    cache.put("big", ("x" * 1000,), ttl=60)
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
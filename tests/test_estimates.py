@@ -0,0 +1,76 @@
+from utils.estimates import _round_nice, estimate_sections, merge_sections
+
+SECTIONS = "## Transport Plan\n- Local: buses\n\n## Estimated Budget Breakdown (INR)\n- Total: INR 1,000-2,000"
+
+
+def _headings(text):
+    return [line for line in text.splitlines() if line.startswith("## ")]
+
+
+def test_round_nice_keeps_two_significant_digits():
+    assert _round_nice(12345) == 12000
+    assert _round_nice(987) == 990
+    assert _round_nice(42.4) == 42
+    assert _round_nice(0) == 0
+    assert _round_nice(-5) == 0
+
+
+def test_unknown_currency_falls_back_to_usd():
+    text = estimate_sections("Goa, India", days=3, budget="Low", currency="xyz",
+                             travel_type="Solo", transport_pref="Any", distance_km=500)
+
+    assert "## Estimated Budget Breakdown (USD)" in text
+    assert "no offline rate for XYZ, shown in USD" in text
+
+
+def test_zero_distance_is_a_real_departure():
+    text = estimate_sections("Goa, India", days=3, budget="Low", currency="INR",
+                             travel_type="Solo", transport_pref="Any", distance_km=0.0)
+
+    assert "add a departure city" not in text
+    assert "(~0 km)" in text
+
+
+def test_no_distance_asks_for_a_departure():
+    text = estimate_sections("Goa, India", days=3, budget="Low", currency="INR",
+                             travel_type="Solo", transport_pref="Any", distance_km=None)
+
+    assert "add a departure city" in text
+
+
+def test_merge_inserts_after_itinerary_and_drops_model_sections():
+    plan = (
+        "## Day-wise Itinerary\nDay 1: Beach\n\n"
+        "## Transport Plan\n- Fly, INR 99\n\n"
+        "## Food Recommendations\n- Fish curry\n\n"
+        "## Estimated Budget Breakdown (INR)\n- Total: INR 5"
+    )
+
+    merged = merge_sections(plan, SECTIONS)
+
+    assert _headings(merged) == [
+        "## Day-wise Itinerary",
+        "## Transport Plan",
+        "## Estimated Budget Breakdown (INR)",
+        "## Food Recommendations",
+    ]
+    assert "INR 99" not in merged
+    assert "- Total: INR 5" not in merged.splitlines()
+
+
+def test_merge_without_itinerary_heading_puts_sections_before_other_sections():
+    plan = "Here is your plan!\n\n## Food Recommendations\n- Fish curry\n\n## Travel Tips\n- Start early"
+
+    merged = merge_sections(plan, SECTIONS)
+
+    assert merged.startswith("Here is your plan!")
+    assert _headings(merged) == [
+        "## Transport Plan",
+        "## Estimated Budget Breakdown (INR)",
+        "## Food Recommendations",
+        "## Travel Tips",
+    ]
+
+
+def test_merge_of_empty_output_is_just_the_sections():
+    assert merge_sections("", SECTIONS) == SECTIONS
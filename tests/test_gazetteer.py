@@ -0,0 +1,48 @@
+from utils.gazetteer import Gazetteer, build_index
+
+
+def _city(geonameid, name, lat, lon, cc, admin1, population):
+    cols = [str(geonameid), name, name, "", str(lat), str(lon), "P", "PPL", cc, "", admin1,
+            "", "", "", str(population), "", "", "Asia/Kolkata", "2024-01-01"]
+    return "\t".join(cols)
+
+
+def _index(tmp_path):
+    cities = tmp_path / "cities.txt"
+    cities.write_text("\n".join([
+        _city(1, "Aurangabad", 19.88, 75.34, "IN", "16", 1_200_000),   # Maharashtra
+        _city(2, "Aurangabad", 24.75, 84.37, "IN", "34", 100_000),     # Bihar
+        _city(3, "Patna", 25.59, 85.14, "IN", "34", 1_600_000),
+    ]) + "\n", encoding="utf-8")
+
+    countries = tmp_path / "countryInfo.txt"
+    countries.write_text("IN\tIND\t356\tIN\tIndia\n", encoding="utf-8")
+
+    admin1 = tmp_path / "admin1CodesASCII.txt"
+    admin1.write_text("IN.16\tMaharashtra\tMaharashtra\t1\nIN.34\tBihar\tBihar\t2\n", encoding="utf-8")
+
+    out = tmp_path / "gazetteer.idx"
+    build_index(str(cities), str(out), str(countries), str(admin1))
+    return Gazetteer(str(out))
+
+
+def test_state_hint_picks_same_name_city_in_that_state(tmp_path):
+    gaz = _index(tmp_path)
+
+    assert gaz.lookup("Aurangabad, Bihar, India")["admin1"] == "bihar"
+    assert gaz.lookup("Aurangabad, Maharashtra, India")["admin1"] == "maharashtra"
+
+
+def test_state_hint_that_contradicts_every_candidate_falls_back(tmp_path):
+    gaz = _index(tmp_path)
+
+    # only the country matches: the state says otherwise, so let Nominatim answer
+    assert gaz.lookup("Patna, Maharashtra, India") is None
+    # without a state the most populous match in the country is still fine
+    assert gaz.lookup("Aurangabad, India")["admin1"] == "maharashtra"
+
+
+def test_unknown_parts_are_ignored(tmp_path):
+    gaz = _index(tmp_path)
+
+    assert gaz.lookup("Patna, Patna Rural, Bihar, 800001, India")["name"] == "Patna"
@@ -0,0 +1,107 @@
+import json
+
+from utils import itinerary
+from utils.itinerary import JsonObjectStream, StructuredPlan, generate_structured_plan
+
+PLACES = ["Fort Aguada", "Baga Beach", "Dudhsagar Falls"]
+
+
+def _day(day, places, **extra):
+    return json.dumps({"type": "day", "day": day, "title": f"Day {day}", "places": places, **extra})
+
+
+def _section(kind, items):
+    return json.dumps({"type": kind, "items": items})
+
+
+def test_stream_joins_objects_split_across_chunks():
+    stream = JsonObjectStream()
+    text = _day(1, ["Fort Aguada"]) + "\n" + _day(2, ["Baga Beach"])
+
+    found = []
+    for i in range(0, len(text), 7):
+        found.extend(stream.feed(text[i:i + 7]))
+
+    assert [obj["day"] for obj in found] == [1, 2]
+    assert stream.buffer == ""
+
+
+def test_stream_ignores_braces_and_escaped_quotes_inside_strings():
+    raw = r'{"type": "tips", "items": ["use {curly} braces", "say \"hi\" }{"]}'
+
+    (obj,) = JsonObjectStream().feed(raw)
+
+    assert obj["items"] == ["use {curly} braces", 'say "hi" }{']
+
+
+def test_stream_skips_code_fences_chatter_and_broken_objects():
+    text = (
+        "Sure! Here is your plan:\n```json\n"
+        + _day(1, ["Fort Aguada"])
+        + "\n{not json}\n"
+        + _section("food", ["Fish curry"])
+        + "\n```\nEnjoy your trip!"
+    )
+
+    objects = JsonObjectStream().feed(text)
+
+    assert [obj["type"] for obj in objects] == ["day", "food"]
+
+
+def test_plan_rejects_days_outside_range():
+    plan = StructuredPlan(days=2, allowed_places=PLACES)
+
+    assert not plan.add(json.loads(_day(0, ["Fort Aguada"])))
+    assert not plan.add(json.loads(_day(3, ["Fort Aguada"])))
+    assert not plan.add({"type": "day", "day": "two"})
+    assert plan.add(json.loads(_day(2, ["Fort Aguada"])))
+    assert set(plan.day_items) == {2}
+
+
+def test_plan_problems_report_missing_unknown_and_empty():
+    plan = StructuredPlan(days=3, allowed_places=PLACES)
+    plan.add(json.loads(_day(1, ["fort  aguada"])))          # case/space-insensitive match
+    plan.add(json.loads(_day(2, ["Eiffel Tower"])))
+    plan.add(json.loads(_day(3, [])))
+    plan.add(json.loads(_section("food", ["Fish curry"])))
+
+    assert plan.problems() == [
+        (2, "not in list: Eiffel Tower"),
+        (3, "no places listed"),
+        ("tips", "missing"),
+    ]
+
+
+def test_repair_only_fills_failing_keys(monkeypatch):
+    first = "\n".join([
+        _day(1, ["Fort Aguada"]),
+        _day(2, ["Eiffel Tower"]),
+        _section("food", ["Fish curry"]),
+        _section("tips", ["Carry water"]),
+    ])
+    # the repair answers day 2 but also tries to rewrite day 1 and food, which had passed
+    repair = "\n".join([
+        _day(1, ["Dudhsagar Falls"], morning="overwritten"),
+        _day(2, ["Baga Beach"]),
+        _section("food", []),
+    ])
+    prompts = []
+
+    monkeypatch.setattr(itinerary, "stream_text", lambda **kw: iter([first[:40], first[40:]]))
+
+    def fake_generate(prompt, **kw):
+        prompts.append(prompt)
+        return repair
+
+    monkeypatch.setattr(itinerary, "generate_text", fake_generate)
+
+    plan, problems = generate_structured_plan(
+        prompt="trip", destination_city="Goa", days=2, currency="INR", allowed_places=PLACES,
+    )
+
+    assert problems == []
+    assert len(prompts) == 1
+    assert plan.day_items[1]["places"] == ["Fort Aguada"]
+    assert "morning" not in plan.day_items[1]
+    assert plan.day_items[2]["places"] == ["Baga Beach"]
+    assert plan.sections["food"]["items"] == ["Fish curry"]
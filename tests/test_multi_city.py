@@ -0,0 +1,66 @@
+from utils import multi_city
+from utils.prompt_builder import build_prompt
+
+COORDS = {"Goa": (15.50, 73.83), "Hampi": (15.33, 76.46)}
+ATTRACTIONS = {"Goa": ["Fort Aguada", "Se Cathedral"], "Hampi": ["Virupaksha Temple", "Fort Aguada"]}
+CATEGORIES = {
+    "Goa": {"Culture / History 🏛️": ["Fort Aguada", "Se Cathedral"]},
+    "Hampi": {"Culture / History 🏛️": ["Virupaksha Temple", "Se Cathedral"]},
+}
+
+
+def _stub_lookups(monkeypatch):
+    monkeypatch.setattr(multi_city, "geocode_city", COORDS.get)
+    monkeypatch.setattr(multi_city, "get_attractions_osm", lambda city, **kw: ATTRACTIONS[city])
+    monkeypatch.setattr(multi_city, "get_city_categories", lambda city, **kw: CATEGORIES[city])
+    monkeypatch.setattr(multi_city, "get_nearby_day_trips", lambda city, **kw: {})
+
+
+def test_place_in_a_legs_attractions_and_categories_stays_in_its_prompt(monkeypatch):
+    _stub_lookups(monkeypatch)
+
+    goa, hampi = multi_city.fetch_circuit_data([("Goa", 2), ("Hampi", 2)])
+
+    assert goa["attractions"] == ["Fort Aguada", "Se Cathedral"]
+    assert goa["city_categories"]["Culture / History 🏛️"] == ["Fort Aguada", "Se Cathedral"]
+
+    prompt = build_prompt(
+        destination_full="Goa", destination_city="Goa", departure_full="", days=2,
+        budget="Low", currency="INR", travel_type="Solo", transport_pref="Any", interests=[],
+        attractions=goa["attractions"], city_categories=goa["city_categories"],
+        nearby_trips=goa["nearby_trips"],
+    )
+    assert "Fort Aguada" in prompt
+
+    # places already offered by an earlier leg are dropped from later legs
+    assert hampi["attractions"] == ["Virupaksha Temple"]
+    assert hampi["city_categories"]["Culture / History 🏛️"] == ["Virupaksha Temple"]
+
+
+def test_shift_days_renumbers_common_heading_styles():
+    text = "\n".join([
+        "Day 1: Arrive",
+        "**Day 2**: Forts",
+        "### Day 3: Beaches",
+        "- Day 4: Market",
+        "* **Day 5**: Leave",
+        "Stay for a Day 1 special",
+    ])
+
+    assert multi_city._shift_days(text, 5).splitlines() == [
+        "Day 6: Arrive",
+        "**Day 7**: Forts",
+        "### Day 8: Beaches",
+        "- Day 9: Market",
+        "* **Day 10**: Leave",
+        "Stay for a Day 1 special",
+    ]
+
+
+def test_repeated_stop_keeps_its_places(monkeypatch):
+    _stub_lookups(monkeypatch)
+
+    goa, hampi, goa_again = multi_city.fetch_circuit_data([("Goa", 2), ("Hampi", 2), ("Goa", 1)])
+
+    assert goa_again["city_categories"] == goa["city_categories"]
+    assert goa_again["attractions"] == ["Fort Aguada", "Se Cathedral"]
@@ -0,0 +1,23 @@
+import pytest
+
+from utils import place_cache
+from utils.byte_cache import ByteLRUCache
+
+
+def test_key_locks_are_released_after_failures_and_oversized_values(monkeypatch):
+    cache = ByteLRUCache(max_bytes=64, sizeof=place_cache._sizeof)
+    monkeypatch.setattr(place_cache, "get_place_cache", lambda: cache)
+
+    @place_cache.cached(ttl=60)
+    def oversized(city):
+        return ["x" * 1000]
+
+    @place_cache.cached(ttl=60)
+    def failing(city):
+        raise RuntimeError("overpass down")
+
+    assert oversized("Goa") == ("x" * 1000,)
+    with pytest.raises(RuntimeError):
+        failing("Goa")
+
+    assert cache._key_locks == {}
@@ -0,0 +1,103 @@
+"""
+Thread-safe, byte-bounded LRU with per-entry TTL, shared by the place cache
+(utils/place_cache.py) and the plan store (utils/plan_history.py).
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def sizeof(obj) -> int:
+    """
+    Approximate size of obj and the tuples/lists/dicts it contains.
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (tuple, list)):
+        size += sum(sizeof(x) for x in obj)
+    elif isinstance(obj, dict):
+        size += sum(sizeof(k) + sizeof(v) for k, v in obj.items())
+    return size
+
+
+class ByteLRUCache:
+    """
+    LRU keyed by any hashable, bounded by max_bytes as measured by sizeof.
+    """
+
+    def __init__(self, max_bytes: int, sizeof=sizeof):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (value, nbytes, expires_at)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, count: bool = True):
+        """
+        (True, value) on a live hit, (False, None) otherwise.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] < time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += count
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += count
+            return True, entry[0]
+
+    def put(self, key, value, ttl: float):
+        nbytes = self._sizeof(value) + self._sizeof(key)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (value, nbytes, time.monotonic() + ttl)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def key_lock(self, key) -> threading.Lock:
+        # one computation per key: concurrent sessions asking for the same value wait for the first
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def release_key_lock(self, key, lock: threading.Lock):
+        """
+        Forget the key's lock once its computation is over (stored, too big or
+        failed); threads already waiting on it still get it and re-check the cache.
+        """
+        with self._lock:
+            if self._key_locks.get(key) is lock:
+                del self._key_locks[key]
+
+    def _drop(self, key):
+        _, nbytes, _ = self._entries.pop(key)
+        self.bytes -= nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,19 @@
+import os
+
+import streamlit as st
+
+
+def get_config(key: str, default=None):
+    """
+    Read a setting from the environment first, then Streamlit secrets.
+    Environment wins so the same secrets.toml can be reused across pods.
+    """
+    value = os.environ.get(key)
+    if value:
+        return value
+
+    try:
+        return st.secrets.get(key, default)
+    except Exception:
+        # no secrets.toml at all (e.g. air-gapped local runs)
+        return default
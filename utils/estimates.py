@@ -0,0 +1,294 @@
+"""
+Deterministic transport + budget estimates, so the LLM does not have to
+spend output tokens on the "Transport Plan" and "Estimated Budget Breakdown"
+sections. All costs in the tables are USD and converted at the end.
+"""
+import re
+
+from utils.travel_time import estimate_travel_time, format_hours_range
+
+# Approximate units of currency per 1 USD (static on purpose: no network call,
+# and the estimates are ranges anyway).
+USD_RATES = {
+    "USD": 1.0, "INR": 83.0, "EUR": 0.92, "GBP": 0.79, "AED": 3.67, "SAR": 3.75,
+    "SGD": 1.35, "MYR": 4.7, "THB": 36.0, "IDR": 15700.0, "VND": 24500.0,
+    "JPY": 150.0, "CNY": 7.2, "KRW": 1330.0, "AUD": 1.52, "NZD": 1.65,
+    "CAD": 1.36, "CHF": 0.88, "LKR": 300.0, "NPR": 133.0, "BDT": 110.0,
+    "PKR": 280.0, "ZAR": 18.5, "BRL": 5.0, "MXN": 17.0, "TRY": 32.0,
+}
+
+# Per region, per budget level, (low, high) in USD:
+#   stay = per room per night, food/activities/local = per person per day
+COST_TABLE = {
+    "South Asia": {
+        "Low": {"stay": (10, 25), "food": (5, 10), "activities": (2, 6), "local": (2, 5)},
+        "Medium": {"stay": (30, 70), "food": (10, 20), "activities": (6, 15), "local": (5, 12)},
+        "High": {"stay": (90, 250), "food": (25, 60), "activities": (15, 40), "local": (15, 35)},
+    },
+    "Southeast Asia": {
+        "Low": {"stay": (12, 30), "food": (6, 12), "activities": (3, 10), "local": (2, 6)},
+        "Medium": {"stay": (35, 80), "food": (12, 25), "activities": (10, 25), "local": (6, 15)},
+        "High": {"stay": (100, 300), "food": (30, 70), "activities": (25, 60), "local": (20, 45)},
+    },
+    "East Asia": {
+        "Low": {"stay": (30, 60), "food": (15, 25), "activities": (5, 15), "local": (5, 10)},
+        "Medium": {"stay": (70, 150), "food": (30, 50), "activities": (15, 35), "local": (10, 20)},
+        "High": {"stay": (200, 450), "food": (60, 150), "activities": (40, 90), "local": (25, 60)},
+    },
+    "Middle East": {
+        "Low": {"stay": (35, 70), "food": (12, 25), "activities": (8, 20), "local": (5, 12)},
+        "Medium": {"stay": (80, 180), "food": (25, 50), "activities": (25, 60), "local": (12, 25)},
+        "High": {"stay": (250, 600), "food": (60, 150), "activities": (60, 150), "local": (30, 70)},
+    },
+    "Europe": {
+        "Low": {"stay": (40, 80), "food": (20, 35), "activities": (10, 20), "local": (6, 12)},
+        "Medium": {"stay": (90, 180), "food": (40, 70), "activities": (20, 45), "local": (10, 20)},
+        "High": {"stay": (250, 600), "food": (80, 180), "activities": (50, 120), "local": (30, 80)},
+    },
+    "North America / Oceania": {
+        "Low": {"stay": (60, 110), "food": (25, 40), "activities": (10, 25), "local": (8, 15)},
+        "Medium": {"stay": (130, 250), "food": (50, 90), "activities": (25, 60), "local": (15, 35)},
+        "High": {"stay": (300, 700), "food": (100, 200), "activities": (60, 150), "local": (40, 100)},
+    },
+    "Default": {
+        "Low": {"stay": (20, 50), "food": (10, 20), "activities": (5, 15), "local": (3, 8)},
+        "Medium": {"stay": (60, 130), "food": (20, 45), "activities": (15, 35), "local": (8, 20)},
+        "High": {"stay": (180, 450), "food": (50, 120), "activities": (40, 100), "local": (25, 60)},
+    },
+}
+
+REGION_BY_COUNTRY = {
+    "india": "South Asia", "nepal": "South Asia", "sri lanka": "South Asia",
+    "bangladesh": "South Asia", "bhutan": "South Asia", "pakistan": "South Asia", "maldives": "South Asia",
+    "thailand": "Southeast Asia", "vietnam": "Southeast Asia", "viet nam": "Southeast Asia",
+    "indonesia": "Southeast Asia", "malaysia": "Southeast Asia", "philippines": "Southeast Asia",
+    "cambodia": "Southeast Asia", "laos": "Southeast Asia", "myanmar": "Southeast Asia",
+    "singapore": "East Asia", "japan": "East Asia", "south korea": "East Asia", "china": "East Asia",
+    "taiwan": "East Asia", "hong kong": "East Asia",
+    "united arab emirates": "Middle East", "saudi arabia": "Middle East", "qatar": "Middle East",
+    "oman": "Middle East", "turkey": "Middle East", "türkiye": "Middle East", "israel": "Middle East",
+    "jordan": "Middle East",
+    "france": "Europe", "germany": "Europe", "italy": "Europe", "spain": "Europe",
+    "portugal": "Europe", "united kingdom": "Europe", "netherlands": "Europe", "switzerland": "Europe",
+    "austria": "Europe", "greece": "Europe", "belgium": "Europe", "ireland": "Europe",
+    "czechia": "Europe", "poland": "Europe", "hungary": "Europe", "croatia": "Europe",
+    "norway": "Europe", "sweden": "Europe", "denmark": "Europe", "finland": "Europe",
+    "united states": "North America / Oceania", "united states of america": "North America / Oceania",
+    "canada": "North America / Oceania", "australia": "North America / Oceania",
+    "new zealand": "North America / Oceania",
+}
+
+# USD per person per km (low, high), one way
+TRANSPORT_PER_KM = {
+    "South Asia": {"Train": (0.006, 0.03), "Bus": (0.008, 0.025), "Car": (0.05, 0.12), "Flight": (0.05, 0.12)},
+    "Default": {"Train": (0.08, 0.25), "Bus": (0.05, 0.12), "Car": (0.15, 0.35), "Flight": (0.08, 0.2)},
+}
+FLIGHT_BASE_USD = (25, 60)
+
+# travel type -> (people, rooms)
+GROUP_SIZE = {"Solo": (1, 1), "Family": (4, 2), "Friends": (3, 2)}
+
+
+def region_for(destination_full: str) -> str:
+    """
+    "Goa, India" -> "South Asia" (last address part = country, as Nominatim returns it).
+    """
+    if not destination_full:
+        return "Default"
+    country = destination_full.split(",")[-1].strip().lower()
+    return REGION_BY_COUNTRY.get(country, "Default")
+
+
+def _round_nice(value: float) -> int:
+    """
+    Round to 2 significant digits: 12345 -> 12000, 987 -> 990.
+    """
+    if value <= 0:
+        return 0
+    digits = len(str(int(value))) - 2
+    step = 10 ** max(digits, 0)
+    return int(round(value / step) * step)
+
+
+def _money(low_usd: float, high_usd: float, currency: str) -> str:
+    rate = USD_RATES[currency]
+    return f"{currency} {_round_nice(low_usd * rate):,}-{_round_nice(high_usd * rate):,}"
+
+
+def _main_mode(mode_label: str) -> str:
+    # estimate_travel_time labels look like "Train", "Train/Car", "Flight/Train"
+    return mode_label.split("/")[0]
+
+
+LOCAL_MODES = {
+    "Low": "public buses, shared autos/metro",
+    "Medium": "metro/app cabs, occasional taxi",
+    "High": "private car with driver / taxis",
+}
+
+
+def _resolve_currency(currency: str):
+    currency = (currency or "INR").strip().upper()
+    if currency not in USD_RATES:
+        return "USD", f" (no offline rate for {currency}, shown in USD)"
+    return currency, ""
+
+
+def _hop_cost(distance_km: float, transport_pref: str, region: str, people: int):
+    """
+    One-way fare for the whole group: (low_usd, high_usd, mode_label, low_h, high_h).
+    """
+    per_km = TRANSPORT_PER_KM.get(region, TRANSPORT_PER_KM["Default"])
+    low_h, high_h, mode_label = estimate_travel_time(distance_km, transport_pref)
+    mode = _main_mode(mode_label)
+    km_low, km_high = per_km.get(mode, per_km["Train"])
+
+    low = people * distance_km * km_low
+    high = people * distance_km * km_high
+    if mode == "Flight":
+        low += people * FLIGHT_BASE_USD[0]
+        high += people * FLIGHT_BASE_USD[1]
+    return low, high, mode_label, low_h, high_h
+
+
+def _stay_costs(region: str, budget: str, people: int, rooms: int, days: int, nights: int) -> dict:
+    """
+    USD (low, high) for local transport, stay, food and activities at one place.
+    """
+    costs = COST_TABLE[region].get(budget, COST_TABLE[region]["Medium"])
+    return {
+        "local": (costs["local"][0] * people * days, costs["local"][1] * people * days),
+        "stay": (costs["stay"][0] * rooms * nights, costs["stay"][1] * rooms * nights),
+        "food": (costs["food"][0] * people * days, costs["food"][1] * people * days),
+        "activities": (costs["activities"][0] * people * days, costs["activities"][1] * people * days),
+    }
+
+
+def _budget_section(inter: tuple, parts: dict, nights: int, rooms: int, people: int,
+                    currency: str, note: str) -> list:
+    total_low = inter[0] + sum(v[0] for v in parts.values())
+    total_high = inter[1] + sum(v[1] for v in parts.values())
+    stay_low, stay_high = parts["stay"]
+
+    return [
+        f"## Estimated Budget Breakdown ({currency})",
+        f"- Transport: {_money(inter[0] + parts['local'][0], inter[1] + parts['local'][1], currency)}",
+        f"- Stay: {_money(stay_low, stay_high, currency)} ({nights} night(s), {rooms} room(s))"
+        if nights else "- Stay: none (day trip)",
+        f"- Food: {_money(*parts['food'], currency)}",
+        f"- Activities: {_money(*parts['activities'], currency)}",
+        f"- Total: {_money(total_low, total_high, currency)} for {people} traveller(s){note}",
+    ]
+
+
+def estimate_sections(
+    destination_full: str,
+    days: int,
+    budget: str,
+    currency: str,
+    travel_type: str,
+    transport_pref: str,
+    distance_km: float = None,
+) -> str:
+    """
+    Markdown for "## Transport Plan" + "## Estimated Budget Breakdown (CUR)".
+    distance_km is departure -> destination (None if no departure / not geocoded).
+    """
+    currency, note = _resolve_currency(currency)
+    region = region_for(destination_full)
+    people, rooms = GROUP_SIZE.get(travel_type, (1, 1))
+    nights = max(days - 1, 0)
+
+    # ---------- Transport ----------
+    transport_lines = ["## Transport Plan"]
+    inter = (0.0, 0.0)
+
+    if distance_km is not None:
+        low, high, mode_label, low_h, high_h = _hop_cost(distance_km, transport_pref, region, people)
+        # return trip for the whole group
+        inter = (2 * low, 2 * high)
+        transport_lines.append(
+            f"- Inter-city: {mode_label}, approx {format_hours_range(low_h, high_h)} each way "
+            f"(~{distance_km:.0f} km), return for {people}: {_money(*inter, currency)}"
+        )
+    else:
+        transport_lines.append("- Inter-city: add a departure city to estimate travel time and fare")
+
+    parts = _stay_costs(region, budget, people, rooms, days, nights)
+    local_modes = LOCAL_MODES.get(budget, "public transport and taxis")
+    transport_lines.append(f"- Local: {local_modes}, {_money(*parts['local'], currency)} total")
+
+    # ---------- Budget ----------
+    budget_lines = _budget_section(inter, parts, nights, rooms, people, currency, note)
+    return "\n".join(transport_lines + [""] + budget_lines)
+
+
+def estimate_circuit_sections(
+    stops: list,
+    hops: list,
+    budget: str,
+    currency: str,
+    travel_type: str,
+    transport_pref: str,
+) -> str:
+    """
+    Same sections for a multi-city circuit.
+    stops: [(destination_full, days)] in visiting order.
+    hops:  [(from_name, to_name, distance_km or None, to_full)] one-way legs,
+           including departure -> first stop and last stop -> departure.
+           to_full (Nominatim-style "City, ..., Country") picks the fare region.
+    """
+    currency, note = _resolve_currency(currency)
+    people, rooms = GROUP_SIZE.get(travel_type, (1, 1))
+
+    transport_lines = ["## Transport Plan"]
+    inter = [0.0, 0.0]
+
+    for from_name, to_name, distance_km, to_full in hops:
+        if distance_km is None:
+            transport_lines.append(f"- {from_name} -> {to_name}: distance unknown")
+            continue
+        low, high, mode_label, low_h, high_h = _hop_cost(distance_km, transport_pref, region_for(to_full), people)
+        inter[0] += low
+        inter[1] += high
+        transport_lines.append(
+            f"- {from_name} -> {to_name}: {mode_label}, approx {format_hours_range(low_h, high_h)} "
+            f"(~{distance_km:.0f} km), {_money(low, high, currency)}"
+        )
+
+    parts = {"local": (0.0, 0.0), "stay": (0.0, 0.0), "food": (0.0, 0.0), "activities": (0.0, 0.0)}
+    total_nights = 0
+    for i, (destination_full, days) in enumerate(stops):
+        # sleep at every stop, except the last night is spent travelling home
+        nights = days if i < len(stops) - 1 else max(days - 1, 0)
+        total_nights += nights
+        stop_parts = _stay_costs(region_for(destination_full), budget, people, rooms, days, nights)
+        parts = {k: (parts[k][0] + v[0], parts[k][1] + v[1]) for k, v in stop_parts.items()}
+
+    local_modes = LOCAL_MODES.get(budget, "public transport and taxis")
+    transport_lines.append(f"- Local: {local_modes}, {_money(*parts['local'], currency)} total")
+
+    budget_lines = _budget_section(tuple(inter), parts, total_nights, rooms, people, currency, note)
+    return "\n".join(transport_lines + [""] + budget_lines)
+
+
+def merge_sections(plan_text: str, sections: str) -> str:
+    """
+    Insert the locally computed sections right after the day-wise itinerary
+    (before the first other "## " heading), dropping any transport/budget
+    sections the model produced anyway.
+    """
+    blocks = re.split(r"(?m)^(?=## )", plan_text or "")
+    kept = [
+        b.strip() for b in blocks
+        if b.strip() and not re.match(r"## (Transport Plan|Estimated Budget)", b)
+    ]
+
+    insert_at = len(kept)
+    for i, block in enumerate(kept):
+        if block.startswith("## ") and not block.startswith("## Day-wise"):
+            insert_at = i
+            break
+
+    kept.insert(insert_at, sections.strip())
+    return "\n\n".join(kept)
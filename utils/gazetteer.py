@@ -0,0 +1,299 @@
+"""
+Offline gazetteer: resolve common city names to coordinates without Nominatim.
+
+The index is one binary file, memory-mapped read-only and binary-searched in
+place, so lookups cost a few microseconds and nothing is parsed at start-up.
+
+Build it from a GeoNames dump (https://download.geonames.org/export/dump/):
+    python -m utils.gazetteer cities15000.txt -o data/gazetteer.idx \\
+        --countries countryInfo.txt --admin1 admin1CodesASCII.txt
+
+File layout (little-endian):
+    header   magic, version, counts and section offsets
+    records  one per place: lat, lon, population, display name, country, admin1
+    entries  (normalized key, record) sorted by key, then population desc,
+             one per name/alias of each place
+    regions  normalized country / admin1 names used to disambiguate queries,
+             flagged by kind
+    blob     UTF-8 strings referenced by the sections above
+"""
+import argparse
+import mmap
+import os
+import re
+import struct
+import unicodedata
+
+MAGIC = b"GAZ1"
+VERSION = 2
+
+HEADER = struct.Struct("<4s8I")
+RECORD = struct.Struct("<ffIIH2sHH")   # lat, lon, population, name_off, name_len, cc, country, admin1
+ENTRY = struct.Struct("<IBI")          # key_off, key_len, record index
+REGION = struct.Struct("<IHB")         # off, len, kind (COUNTRY | ADMIN1 bits)
+
+NO_REGION = 0xFFFF
+COUNTRY, ADMIN1 = 1, 2
+MAX_KEY_BYTES = 255
+
+
+def normalize_name(name: str) -> str:
+    """
+    "São Paulo" -> "sao paulo", "Bengaluru (Bangalore)" -> "bengaluru bangalore"
+    """
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKD", name)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[\W_]+", " ", text.casefold())
+    return text.strip()
+
+
+class Gazetteer:
+    """
+    Read-only view over a gazetteer index file.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self.n_records, self.n_entries, self.n_regions,
+         self.records_off, self.entries_off, self.regions_off, self.blob_off) = HEADER.unpack_from(self.mm, 0)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a gazetteer index (version {VERSION})")
+
+        self._admin1_names = None
+
+    def __len__(self):
+        return self.n_records
+
+    def _entry(self, i: int):
+        key_off, key_len, rec = ENTRY.unpack_from(self.mm, self.entries_off + i * ENTRY.size)
+        start = self.blob_off + key_off
+        return self.mm[start:start + key_len], rec
+
+    def _string(self, off: int, length: int) -> str:
+        start = self.blob_off + off
+        return self.mm[start:start + length].decode("utf-8")
+
+    def _region(self, idx: int) -> str:
+        if idx == NO_REGION:
+            return ""
+        off, length, _ = REGION.unpack_from(self.mm, self.regions_off + idx * REGION.size)
+        return self._string(off, length)
+
+    def admin1_names(self) -> set:
+        """
+        Every state/province name in the index (read on first use).
+        """
+        if self._admin1_names is None:
+            names = set()
+            for i in range(self.n_regions):
+                off, length, kind = REGION.unpack_from(self.mm, self.regions_off + i * REGION.size)
+                if kind & ADMIN1:
+                    names.add(self._string(off, length))
+            self._admin1_names = names
+        return self._admin1_names
+
+    def _record(self, idx: int) -> dict:
+        lat, lon, population, name_off, name_len, cc, country, admin1 = RECORD.unpack_from(
+            self.mm, self.records_off + idx * RECORD.size
+        )
+        return {
+            "name": self._string(name_off, name_len),
+            "lat": lat,
+            "lon": lon,
+            "population": population,
+            "country_code": cc.decode("ascii").strip(),
+            "country": self._region(country),
+            "admin1": self._region(admin1),
+        }
+
+    def candidates(self, name: str, limit: int = 10) -> list:
+        """
+        All places called `name` (any indexed alias), most populous first.
+        """
+        key = normalize_name(name).encode("utf-8")
+        if not key:
+            return []
+
+        lo, hi = 0, self.n_entries
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        found, seen = [], set()
+        i = lo
+        while i < self.n_entries and len(found) < limit:
+            entry_key, rec = self._entry(i)
+            if entry_key != key:
+                break
+            if rec not in seen:
+                seen.add(rec)
+                found.append(self._record(rec))
+            i += 1
+        return found
+
+    def lookup(self, query: str, min_population: int = 100000, dominance: float = 5.0):
+        """
+        Resolve "City" or a Nominatim-style "City, Region, ..., Country".
+
+        At least one extra part must match the candidate's admin1/country, and
+        a part naming a known state must be the candidate's state (or country),
+        so "Aurangabad, Bihar, India" never picks the bigger Aurangabad in
+        Maharashtra. Unknown parts (districts, postcodes) are ignored. A bare name is
+        only resolved when it is clearly the common city: at least
+        `min_population` and `dominance` times bigger than the next place with
+        that name. Anything else returns None (long tail -> ask the network).
+        """
+        parts = [normalize_name(p) for p in (query or "").split(",")]
+        parts = [p for p in parts if p]
+        if not parts:
+            return None
+
+        candidates = self.candidates(parts[0])
+        hints = set(parts[1:])
+        if not hints:
+            if not candidates or candidates[0]["population"] < min_population:
+                return None
+            if len(candidates) > 1 and candidates[0]["population"] < dominance * candidates[1]["population"]:
+                return None
+            return candidates[0]
+
+        state_hints = hints & self.admin1_names()
+        for c in candidates:
+            regions = {c["country"], c["admin1"], c["country_code"].lower()}
+            if not hints & regions:
+                continue
+            if state_hints - {c["admin1"], c["country"]}:
+                continue
+            return c
+        return None
+
+
+def _read_regions(path: str, name_col: int) -> dict:
+    """
+    GeoNames countryInfo.txt (ISO -> country) or admin1CodesASCII.txt ("IN.19" -> state).
+    """
+    regions = {}
+    if not path:
+        return regions
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) > name_col:
+                regions[cols[0]] = cols[name_col]
+    return regions
+
+
+def build_index(cities_path: str, out_path: str, countries_path: str = None,
+                admin1_path: str = None, min_population: int = 0, max_aliases: int = 10) -> int:
+    """
+    Build an index file from a GeoNames cities*.txt / allCountries.txt dump.
+    Returns the number of places written.
+    """
+    countries = _read_regions(countries_path, name_col=4)
+    admin1 = _read_regions(admin1_path, name_col=2)
+
+    blob = bytearray()
+    strings = {}
+
+    def add_string(s: str):
+        if s not in strings:
+            data = s.encode("utf-8")
+            strings[s] = (len(blob), len(data))
+            blob.extend(data)
+        return strings[s]
+
+    region_ids = {}
+
+    region_kinds = {}
+
+    def add_region(name: str, kind: int) -> int:
+        name = normalize_name(name)
+        if not name:
+            return NO_REGION
+        if name not in region_ids:
+            region_ids[name] = len(region_ids)
+        region_kinds[name] = region_kinds.get(name, 0) | kind
+        return region_ids[name]
+
+    records, entries = [], []
+
+    with open(cities_path, encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 15 or cols[6] != "P":  # populated places only
+                continue
+
+            population = int(cols[14] or 0)
+            if population < min_population:
+                continue
+
+            name, ascii_name, alt_names, cc = cols[1], cols[2], cols[3], cols[8]
+            country = add_region(countries.get(cc, ""), COUNTRY)
+            region = add_region(admin1.get(f"{cc}.{cols[10]}", ""), ADMIN1)
+
+            idx = len(records)
+            name_off, name_len = add_string(name)
+            records.append((float(cols[4]), float(cols[5]), min(population, 0xFFFFFFFF),
+                            name_off, name_len, cc.encode("ascii", "ignore")[:2].ljust(2), country, region))
+
+            aliases = [name, ascii_name] + [a for a in alt_names.split(",") if a][:max_aliases]
+            keys = {normalize_name(a) for a in aliases}
+            for key in keys:
+                if key and len(key.encode("utf-8")) <= MAX_KEY_BYTES:
+                    entries.append((key.encode("utf-8"), -population, idx))
+
+    if len(region_ids) >= NO_REGION:
+        raise ValueError("Too many regions for the index format")
+
+    entries.sort()
+    region_table = [add_string(name) + (region_kinds[name],)
+                    for name, _ in sorted(region_ids.items(), key=lambda kv: kv[1])]
+    entry_refs = [(add_string(key.decode("utf-8")), idx) for key, _, idx in entries]
+
+    records_off = HEADER.size
+    entries_off = records_off + len(records) * RECORD.size
+    regions_off = entries_off + len(entry_refs) * ENTRY.size
+    blob_off = regions_off + len(region_table) * REGION.size
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, VERSION, len(records), len(entry_refs), len(region_table),
+                              records_off, entries_off, regions_off, blob_off))
+        for r in records:
+            out.write(RECORD.pack(*r))
+        for (key_off, key_len), idx in entry_refs:
+            out.write(ENTRY.pack(key_off, key_len, idx))
+        for off, length, kind in region_table:
+            out.write(REGION.pack(off, length, kind))
+        out.write(blob)
+
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline gazetteer index from a GeoNames dump.")
+    parser.add_argument("cities", help="GeoNames cities*.txt or allCountries.txt")
+    parser.add_argument("-o", "--output", default="data/gazetteer.idx")
+    parser.add_argument("--countries", help="GeoNames countryInfo.txt (country names)")
+    parser.add_argument("--admin1", help="GeoNames admin1CodesASCII.txt (state names)")
+    parser.add_argument("--min-population", type=int, default=0)
+    parser.add_argument("--max-aliases", type=int, default=10, help="alternate names indexed per place")
+    args = parser.parse_args()
+
+    n = build_index(args.cities, args.output, args.countries, args.admin1,
+                    args.min_population, args.max_aliases)
+    print(f"Wrote {n} places to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import json
+import re
+
+from utils.llm import generate_text, stream_text
+from utils.prompt_builder import build_repair_prompt, STRUCTURED_PREFIX
+
+# Transport and budget are computed locally (utils/estimates.py)
+SECTION_TYPES = ["food", "tips"]
+
+SECTION_HEADINGS = {
+    "food": "## Food Recommendations",
+    "tips": "## Travel Tips",
+}
+
+
+class JsonObjectStream:
+    """
+    Incremental parser for a stream of JSON objects.
+    Feed it text chunks; it returns every top-level {...} object that is
+    complete so far. Text outside objects (code fences, chatter) is ignored,
+    and objects that fail to parse are skipped instead of aborting the stream.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.start = None
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, chunk: str) -> list:
+        self.buffer += chunk
+        objects = []
+
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == "{":
+                if self.depth == 0:
+                    self.start = self.pos
+                self.depth += 1
+            elif ch == "}" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    raw = self.buffer[self.start:self.pos + 1]
+                    try:
+                        obj = json.loads(raw)
+                    except ValueError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        objects.append(obj)
+                    self.start = None
+            elif ch == '"' and self.depth > 0:
+                self.in_string = True
+
+            self.pos += 1
+
+        # drop consumed text so the buffer stays small on long streams
+        keep_from = self.start if self.start is not None else self.pos
+        self.buffer = self.buffer[keep_from:]
+        self.pos -= keep_from
+        if self.start is not None:
+            self.start = 0
+
+        return objects
+
+
+def normalize_place(name: str) -> str:
+    return re.sub(r"\s+", " ", str(name or "")).strip().casefold()
+
+
+class StructuredPlan:
+    """
+    Collects day/section objects as they arrive and checks them
+    against the fetched OSM place set.
+    """
+
+    def __init__(self, days: int, allowed_places: list):
+        self.days = days
+        self.allowed_places = list(dict.fromkeys(allowed_places or []))
+        self.allowed = {normalize_place(p): p for p in self.allowed_places}
+        self.day_items = {}
+        self.sections = {}
+
+    def add(self, obj: dict) -> bool:
+        kind = str(obj.get("type", "")).strip().lower()
+
+        if kind == "day":
+            try:
+                day = int(obj.get("day"))
+            except (TypeError, ValueError):
+                return False
+            if 1 <= day <= self.days:
+                self.day_items[day] = obj
+                return True
+            return False
+
+        if kind in SECTION_TYPES:
+            self.sections[kind] = obj
+            return True
+
+        return False
+
+    def unknown_places(self, day: int) -> list:
+        places = self.day_items.get(day, {}).get("places") or []
+        if isinstance(places, str):
+            places = [places]
+        return [p for p in places if normalize_place(p) not in self.allowed]
+
+    def used_places(self, exclude_days=()) -> list:
+        used = []
+        for day, obj in self.day_items.items():
+            if day in exclude_days:
+                continue
+            places = obj.get("places") or []
+            if isinstance(places, str):
+                places = [places]
+            used.extend(self.allowed.get(normalize_place(p), p) for p in places)
+        return list(dict.fromkeys(used))
+
+    def problems(self) -> list:
+        """
+        Returns [(key, reason)] for every day/section that must be regenerated.
+        """
+        problems = []
+
+        for day in range(1, self.days + 1):
+            obj = self.day_items.get(day)
+            if obj is None:
+                problems.append((day, "missing"))
+                continue
+
+            places = obj.get("places") or []
+            if not places:
+                problems.append((day, "no places listed"))
+                continue
+
+            # without any fetched places there is nothing to check against
+            if self.allowed:
+                unknown = self.unknown_places(day)
+                if unknown:
+                    problems.append((day, "not in list: " + ", ".join(map(str, unknown))))
+
+        for kind in SECTION_TYPES:
+            items = self.sections.get(kind, {}).get("items")
+            if not items:
+                problems.append((kind, "missing"))
+
+        return problems
+
+    def to_markdown(self) -> str:
+        lines = ["## Day-wise Itinerary"]
+
+        for day in range(1, self.days + 1):
+            obj = self.day_items.get(day)
+            if obj is None:
+                continue
+
+            title = str(obj.get("title") or "").strip()
+            lines.append(f"Day {day}: {title}" if title else f"Day {day}:")
+
+            places = obj.get("places") or []
+            if isinstance(places, str):
+                places = [places]
+            if places:
+                names = [self.allowed.get(normalize_place(p), str(p)) for p in places]
+                lines.append(f"- Places: {', '.join(names)}")
+
+            for part in ["morning", "afternoon", "evening"]:
+                text = str(obj.get(part) or "").strip()
+                if text:
+                    lines.append(f"- {part.capitalize()}: {text}")
+            lines.append("")
+
+        for kind in SECTION_TYPES:
+            items = self.sections.get(kind, {}).get("items")
+            if not items:
+                continue
+            if isinstance(items, str):
+                items = [items]
+            lines.append(SECTION_HEADINGS[kind])
+            lines.extend(f"- {str(x).strip()}" for x in items)
+            lines.append("")
+
+        return "\n".join(lines).strip()
+
+
+def generate_structured_plan(
+    prompt: str,
+    destination_city: str,
+    days: int,
+    currency: str,
+    allowed_places: list,
+    temperature: float = 0.7,
+    max_new_tokens: int = 1200,
+    max_repairs: int = 2,
+    on_update=None,
+):
+    """
+    Streams a JSON-lines itinerary, validates each day against the fetched
+    places and regenerates only the failing days/sections (up to max_repairs
+    rounds) instead of retrying the whole plan.
+
+    on_update(plan) is called whenever a new object is accepted, so the UI
+    can render partial results while the stream is still running.
+    Returns (plan, remaining_problems).
+    """
+    plan = StructuredPlan(days, allowed_places)
+    parser = JsonObjectStream()
+
+    for chunk in stream_text(prompt=prompt, temperature=temperature,
+                             max_new_tokens=max_new_tokens, system=STRUCTURED_PREFIX):
+        for obj in parser.feed(chunk):
+            if plan.add(obj) and on_update:
+                on_update(plan)
+
+    problems = plan.problems()
+
+    for _ in range(max_repairs):
+        if not problems:
+            break
+
+        failing_days = {key for key, _ in problems if isinstance(key, int)}
+        repair_prompt = build_repair_prompt(
+            destination_city=destination_city,
+            days=days,
+            currency=currency,
+            allowed_places=plan.allowed_places,
+            used_places=plan.used_places(exclude_days=failing_days),
+            problems=problems,
+        )
+
+        # ~150 tokens per day object, less for sections
+        repair_tokens = min(max_new_tokens, 150 * len(problems) + 100)
+        repaired = generate_text(
+            prompt=repair_prompt,
+            temperature=temperature,
+            max_new_tokens=repair_tokens,
+            system=STRUCTURED_PREFIX,
+        )
+
+        wanted = {key for key, _ in problems}
+        for obj in JsonObjectStream().feed(repaired):
+            key = str(obj.get("type", "")).strip().lower()
+            if key == "day":
+                try:
+                    key = int(obj.get("day"))
+                except (TypeError, ValueError):
+                    continue
+            # never let a repair overwrite a day/section that already passed
+            if key in wanted and plan.add(obj) and on_update:
+                on_update(plan)
+
+        problems = plan.problems()
+
+    return plan, problems
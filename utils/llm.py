@@ -1,55 +1,250 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 import streamlit as st
-from huggingface_hub import InferenceClient
+
+from utils.config import get_config
+from utils.place_cache import show_status
+from utils.prompt_builder import SYSTEM_MESSAGE
 
 MODEL_ID = "meta-llama/Llama-3.1-8B-Instruct"
 
+DEFAULT_BACKEND = "hf"
+DEFAULT_LOCAL_URL = "http://127.0.0.1:8080"
+
+# shown through show_status, so callers can tell a cut-off output with capture_status
+TRUNCATED_WARNING = "⚠️ Response truncated. Try reducing trip days or simplifying prompt."
+
+
+class HFBackend:
+    """
+    Hugging Face Inference API (serverless) backend.
+    """
+
+    name = "hf"
+
+    def __init__(self, token: str, model: str = MODEL_ID):
+        from huggingface_hub import InferenceClient
+
+        self.model = model
+        self.client = InferenceClient(model=model, token=token)
+
+    @classmethod
+    def from_config(cls):
+        token = get_config("HF_TOKEN")
+        if not token:
+            raise ValueError("HF_TOKEN not found in Streamlit secrets (.streamlit/secrets.toml).")
+        return cls(token=token, model=get_config("HF_MODEL_ID", MODEL_ID))
+
+    def chat(self, messages, temperature: float, max_tokens: int):
+        response = self.client.chat.completions.create(
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=False
+        )
+        choice = response.choices[0]
+        return choice.message["content"], getattr(choice, "finish_reason", None)
+
+    def stream_chat(self, messages, temperature: float, max_tokens: int):
+        stream = self.client.chat.completions.create(
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            yield getattr(choice.delta, "content", None) or "", getattr(choice, "finish_reason", None)
+
+
+class LocalBackend:
+    """
+    Local CPU backend: any OpenAI-compatible server, e.g. llama.cpp's
+    `llama-server -m model-Q4_K_M.gguf --parallel 4 --cont-batching`.
+
+    The server does the continuous batching: every active slot advances one
+    token per decode step, and a finished slot is refilled immediately.
+    This object is shared by all sessions (st.cache_resource), and its
+    semaphore admits at most `max_parallel` requests at once - one per server
+    slot - so requests from different sessions join the running batch as soon
+    as a slot frees up instead of queueing inside the HTTP server.
+    """
+
+    name = "local"
+
+    def __init__(self, base_url: str = DEFAULT_LOCAL_URL, model: str = "local",
+                 max_parallel: int = 4, timeout: int = 300):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_parallel)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_parallel)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_config(cls):
+        return cls(
+            base_url=get_config("LOCAL_LLM_URL", DEFAULT_LOCAL_URL),
+            model=get_config("LOCAL_LLM_MODEL", "local"),
+            max_parallel=int(get_config("LOCAL_LLM_PARALLEL", 4)),
+            timeout=int(get_config("LOCAL_LLM_TIMEOUT", 300)),
+        )
+
+    def _payload(self, messages, temperature: float, max_tokens: int, stream: bool):
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": stream,
+            # llama.cpp: keep the slot's KV cache and only re-encode the part
+            # of the prompt after the longest common prefix (the static system prefix)
+            "cache_prompt": True,
+        }
+
+    def chat(self, messages, temperature: float, max_tokens: int):
+        with self.slots:
+            r = self.session.post(
+                f"{self.base_url}/v1/chat/completions",
+                json=self._payload(messages, temperature, max_tokens, stream=False),
+                timeout=self.timeout,
+            )
+            r.raise_for_status()
+            choice = r.json()["choices"][0]
+        return choice["message"]["content"], choice.get("finish_reason")
+
+    def stream_chat(self, messages, temperature: float, max_tokens: int):
+        with self.slots:
+            with self.session.post(
+                f"{self.base_url}/v1/chat/completions",
+                json=self._payload(messages, temperature, max_tokens, stream=True),
+                timeout=self.timeout,
+                stream=True,
+            ) as r:
+                r.raise_for_status()
+
+                # server-sent events: "data: {...}" lines, ends with "data: [DONE]"
+                for line in r.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+
+                    chunk = json.loads(data)
+                    if not chunk.get("choices"):
+                        continue
+                    choice = chunk["choices"][0]
+                    delta = (choice.get("delta") or {}).get("content") or ""
+                    yield delta, choice.get("finish_reason")
+
+
+BACKENDS = {
+    HFBackend.name: HFBackend,
+    LocalBackend.name: LocalBackend,
+}
+
 
 @st.cache_resource
-def get_client():
+def get_backend(name: str = None):
     """
-    Create and cache the Hugging Face inference client.
-    Reads token from Streamlit secrets.
+    Create and cache the configured LLM backend (shared by all sessions).
+    Selected with LLM_BACKEND ("hf" or "local") in env / Streamlit secrets.
     """
-    token = st.secrets.get("HF_TOKEN", None)
-    if not token:
-        raise ValueError("HF_TOKEN not found in Streamlit secrets (.streamlit/secrets.toml).")
+    name = (name or get_config("LLM_BACKEND", DEFAULT_BACKEND)).strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{name}'. Choose one of: {', '.join(BACKENDS)}")
 
-    return InferenceClient(model=MODEL_ID, token=token)
+    return BACKENDS[name].from_config()
 
 
-def generate_text(prompt: str, temperature: float = 0.7, max_new_tokens: int = 3500) -> str:
+def _build_messages(prompt: str, system: str = SYSTEM_MESSAGE):
+    # static system prefix first, per-request data last -> shared prompt prefix
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def generate_text(prompt: str, temperature: float = 0.7, max_new_tokens: int = 3500,
+                  system: str = SYSTEM_MESSAGE) -> str:
     """
     Generate response using Llama 3.1 Instruct (chat style).
-    
+
     IMPORTANT: Llama 3.1-8B has 8192 token context limit TOTAL (prompt + response).
     With optimized prompts (~1000 tokens), we have ~3500 tokens for response.
+
+    Pass the static prompt prefix as `system` (e.g. prompt_builder.STATIC_PREFIX)
+    so it can be served from the backend's prefix/KV cache.
     """
-    client = get_client()
+    backend = get_backend()
+    messages = _build_messages(prompt, system)
 
-    messages = [
-        {
-            "role": "system", 
-            "content": "You are a professional travel planner. Always complete all sections fully."
-        },
-        {"role": "user", "content": prompt},
-    ]
+    try:
+        generated_text, finish_reason = backend.chat(messages, temperature, max_new_tokens)
+
+        if finish_reason == "length":
+            show_status("warning", TRUNCATED_WARNING)
+
+        return generated_text
+
+    except Exception as e:
+        st.error(f"Error generating text: {str(e)}")
+        raise
+
+
+def generate_many(prompts: list, temperature: float = 0.7, max_new_tokens: int = 3500,
+                  system: str = SYSTEM_MESSAGE, max_workers: int = 4) -> list:
+    """
+    generate_text for several independent prompts at once (e.g. one per leg of
+    a multi-city trip). Requests run concurrently, so a local server batches
+    them; results come back in prompt order.
+    """
+    backend = get_backend()
+
+    def run(prompt):
+        return backend.chat(_build_messages(prompt, system), temperature, max_new_tokens)
 
     try:
-        response = client.chat.completions.create(
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_new_tokens,
-            stream=False
-        )
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prompts)))) as pool:
+            results = list(pool.map(run, prompts))
+    except Exception as e:
+        st.error(f"Error generating text: {str(e)}")
+        raise
 
-        generated_text = response.choices[0].message["content"]
+    # UI calls stay on the script thread
+    if any(finish_reason == "length" for _, finish_reason in results):
+        show_status("warning", TRUNCATED_WARNING)
+
+    return [text for text, _ in results]
+
+
+def stream_text(prompt: str, temperature: float = 0.7, max_new_tokens: int = 3500,
+                system: str = SYSTEM_MESSAGE):
+    """
+    Same as generate_text, but yields the response chunk by chunk
+    so callers can parse / render it while it is still being generated.
+    """
+    backend = get_backend()
+    messages = _build_messages(prompt, system)
+
+    try:
+        finish_reason = None
+        for delta, reason in backend.stream_chat(messages, temperature, max_new_tokens):
+            if delta:
+                yield delta
+            finish_reason = reason or finish_reason
 
-        finish_reason = getattr(response.choices[0], 'finish_reason', None)
         if finish_reason == "length":
-            st.warning("⚠️ Response truncated. Try reducing trip days or simplifying prompt.")
-        
-        return generated_text
-        
+            show_status("warning", TRUNCATED_WARNING)
+
     except Exception as e:
         st.error(f"Error generating text: {str(e)}")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,258 @@
+"""
+Multi-city circuits (e.g. Goa -> Gokarna -> Hampi).
+
+Every city's place data is fetched once (and in parallel), day-trip searches
+are shared between stops that are close to each other, POIs are kept only
+at the first stop that offers them, hop travel times are computed in one pass,
+and the per-leg itineraries are generated concurrently and stitched together.
+"""
+import re
+
+from utils.estimates import estimate_circuit_sections
+from utils.llm import generate_many
+from utils.places_osm import (
+    DAY_TRIP_MIN_RADIUS_M,
+    clean_city_name,
+    geocode_city,
+    get_attractions_osm,
+    get_city_categories,
+    get_nearby_day_trips,
+)
+from utils.place_cache import run_captured, replay_status
+from utils.prefetch import get_executor
+from utils.prompt_builder import build_prompt, STATIC_PREFIX
+from utils.travel_time import haversine_km, estimate_travel_time, format_hours_range
+
+# Stops closer than this share one day-trip search. The adaptive search may
+# stop at its minimum radius, so only stops inside that radius are always
+# covered by the anchor's search.
+SHARED_REGION_KM = DAY_TRIP_MIN_RADIUS_M / 1000
+
+
+def _unseen(items, seen: set) -> list:
+    return [item for item in items if item not in seen]
+
+
+def _result(future):
+    # pool tasks return (value, status messages); show them from the script thread
+    value, messages = future.result()
+    replay_status(messages)
+    return value
+
+
+def fetch_circuit_data(stops: list) -> list:
+    """
+    stops: [(destination_full, days)] in visiting order.
+    Returns one dict per leg with city, coords, days, attractions,
+    city_categories and nearby_trips (deduplicated across legs).
+    """
+    pool = get_executor()
+    legs = [{"full": full, "city": clean_city_name(full), "days": days} for full, days in stops]
+
+    # 1) geocode every stop in one go
+    geocoded = [pool.submit(run_captured, geocode_city, leg["city"]) for leg in legs]
+    for leg, future in zip(legs, geocoded):
+        leg["coords"] = _result(future)
+
+    # 2) stops within SHARED_REGION_KM of an earlier stop reuse its day-trip search
+    anchors = []
+    for leg in legs:
+        leg["anchor"] = leg["city"]
+        if leg["coords"]:
+            for a in anchors:
+                if haversine_km(*leg["coords"], *a["coords"]) <= SHARED_REGION_KM:
+                    leg["anchor"] = a["city"]
+                    break
+            else:
+                anchors.append(leg)
+
+    # 3) fetch every distinct city / region once, all in parallel
+    cities = list(dict.fromkeys(leg["city"] for leg in legs))
+    day_trip_cities = list(dict.fromkeys(leg["anchor"] for leg in legs))
+
+    # same arguments as the single-city flow in app.py, so the caches are shared
+    attractions = {
+        c: pool.submit(run_captured, get_attractions_osm, c, limit=12, radius_m=50000, adaptive=True) for c in cities
+    }
+    categories = {
+        c: pool.submit(run_captured, get_city_categories, c, radius_m=40000, limit_each=8, adaptive=True) for c in cities
+    }
+    day_trips = {
+        c: pool.submit(run_captured, get_nearby_day_trips, c, radius_m=200000, limit_each=8, adaptive=True)
+        for c in day_trip_cities
+    }
+
+    # 4) a POI belongs to the first leg that offers it. Only earlier legs in
+    # other cities count: a leg's own attractions and categories may overlap
+    # (the prompt only shows categories), and a city visited twice
+    # (Goa -> Hampi -> Goa) keeps its places on the second visit.
+    # Cached results are shared: copy, don't mutate.
+    attractions = {c: _result(f) for c, f in attractions.items()}
+    categories = {c: _result(f) for c, f in categories.items()}
+    day_trips = {c: _result(f) for c, f in day_trips.items()}
+
+    offered = {}  # city -> places offered by its legs so far
+    for leg in legs:
+        seen = set().union(*(p for city, p in offered.items() if city != leg["city"]))
+        leg["attractions"] = _unseen(attractions[leg["city"]], seen)
+        leg["city_categories"] = {
+            k: _unseen(v, seen) for k, v in categories[leg["city"]].items()
+        }
+        leg["nearby_trips"] = {
+            k: _unseen(v, seen) for k, v in day_trips[leg["anchor"]].items()
+        }
+
+        mine = offered.setdefault(leg["city"], set())
+        mine.update(leg["attractions"])
+        for data in (leg["city_categories"], leg["nearby_trips"]):
+            for places in data.values():
+                mine.update(places)
+
+    return legs
+
+
+def compute_hops(legs: list, departure_full: str = None, transport_pref: str = "Any") -> list:
+    """
+    All hops of the circuit in one pass: departure -> leg 1 -> ... -> leg n -> departure.
+    Each hop: dict(from, to, to_full, distance_km, hint).
+    """
+    points = [{"city": leg["city"], "full": leg["full"], "coords": leg["coords"]} for leg in legs]
+
+    if departure_full:
+        home = {"city": clean_city_name(departure_full), "full": departure_full,
+                "coords": geocode_city(departure_full)}
+        points = [home] + points + [home]
+
+    hops = []
+    for a, b in zip(points, points[1:]):
+        distance_km, hint = None, "Not available"
+        if a["coords"] and b["coords"]:
+            distance_km = haversine_km(*a["coords"], *b["coords"])
+            low, high, mode = estimate_travel_time(distance_km, transport_pref)
+            hint = f"{mode}: approx {format_hours_range(low, high)} (distance ~{distance_km:.0f} km)"
+        hops.append({"from": a["city"], "from_full": a["full"], "to": b["city"], "to_full": b["full"],
+                     "distance_km": distance_km, "hint": hint})
+    return hops
+
+
+def _split_sections(text: str) -> dict:
+    """
+    {"Day-wise Itinerary": "...", "Food Recommendations": "...", ...}
+    """
+    sections = {}
+    for block in re.split(r"(?m)^(?=## )", text or ""):
+        block = block.strip()
+        if not block.startswith("## "):
+            continue
+        heading, _, body = block.partition("\n")
+        title = re.sub(r"\s*\(.*\)\s*$", "", heading[3:].strip())
+        sections[title] = body.strip()
+    return sections
+
+
+def _shift_days(text: str, offset: int) -> str:
+    # "Day 1", "**Day 1", "### Day 1", "- Day 1", "* **Day 1" ...
+    return re.sub(
+        r"(?m)^(\s*(?:#+\s*|[-*]\s+)?(?:\*\*)?Day\s+)(\d+)",
+        lambda m: f"{m.group(1)}{int(m.group(2)) + offset}",
+        text,
+    )
+
+
+def stitch_circuit(legs: list, outputs: list, hops: list, local_sections: str = "") -> str:
+    """
+    One plan from per-leg LLM outputs: overview, day-wise itinerary per leg
+    with continuous day numbers, the locally computed transport/budget
+    sections (utils/estimates.py), then food/tips grouped by city.
+    """
+    lines = ["## Circuit Overview"]
+    first_day = 1
+    ranges = []
+    for leg in legs:
+        last_day = first_day + leg["days"] - 1
+        ranges.append((first_day, last_day))
+        lines.append(f"- {leg['city']}: Day {first_day}" + (f"-{last_day}" if last_day > first_day else ""))
+        first_day = last_day + 1
+    for hop in hops:
+        lines.append(f"- {hop['from']} -> {hop['to']}: {hop['hint']}")
+
+    parsed = [_split_sections(text) for text in outputs]
+
+    for i, (leg, sections, (start, end)) in enumerate(zip(legs, parsed, ranges)):
+        days_text = sections.get("Day-wise Itinerary", "").strip() or "Not available"
+        lines.append("")
+        lines.append(f"## Day-wise Itinerary - Leg {i + 1}: {leg['city']}")
+        lines.append(_shift_days(days_text, start - 1))
+
+    if local_sections:
+        lines.append("")
+        lines.append(local_sections.strip())
+
+    for title in ["Food Recommendations", "Travel Tips"]:
+        lines.append("")
+        lines.append(f"## {title}")
+        for leg, sections in zip(legs, parsed):
+            body = sections.get(title, "").strip()
+            if body:
+                lines.append(f"{leg['city']}:")
+                lines.append(body)
+
+    return "\n".join(lines).strip()
+
+
+def generate_circuit(
+    stops: list,
+    departure_full: str,
+    budget: str,
+    currency: str,
+    travel_type: str,
+    transport_pref: str,
+    interests: list,
+    temperature: float = 0.7,
+    max_new_tokens: int = 1200,
+) -> str:
+    """
+    Full multi-city plan: shared data fetch, one batch of hop estimates,
+    all legs generated concurrently, then stitched into one markdown plan.
+    """
+    legs = fetch_circuit_data(stops)
+    hops = compute_hops(legs, departure_full, transport_pref)
+
+    # hop that arrives at each leg
+    arrivals = hops[:len(legs)] if departure_full else [None] + hops
+
+    prompts = []
+    for leg, arrival in zip(legs, arrivals):
+        prompts.append(build_prompt(
+            destination_full=leg["full"],
+            destination_city=leg["city"],
+            departure_full=arrival["from_full"] if arrival else "",
+            days=leg["days"],
+            budget=budget,
+            currency=currency,
+            travel_type=travel_type,
+            transport_pref=transport_pref,
+            interests=interests,
+            attractions=leg["attractions"],
+            city_categories=leg["city_categories"],
+            nearby_trips=leg["nearby_trips"],
+            travel_time_hint=arrival["hint"] if arrival else "Not available",
+        ))
+
+    outputs = generate_many(
+        prompts,
+        temperature=temperature,
+        max_new_tokens=max_new_tokens,
+        system=STATIC_PREFIX,
+    )
+
+    local_sections = estimate_circuit_sections(
+        stops=[(leg["full"], leg["days"]) for leg in legs],
+        hops=[(h["from"], h["to"], h["distance_km"], h["to_full"]) for h in hops],
+        budget=budget,
+        currency=currency,
+        travel_type=travel_type,
+        transport_pref=transport_pref,
+    )
+
+    return stitch_circuit(legs, outputs, hops, local_sections)
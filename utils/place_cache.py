@@ -0,0 +1,176 @@
+"""
+In-process cache for the OSM place lookups (utils/places_osm.py).
+
+st.cache_data pickles every result and hands each hit a fresh copy, so every
+session holds its own lists of the same place names. Here results are frozen
+once into compact immutable records (tuples of interned names, a __slots__
+mapping for categories) and every hit returns that same object. The cache is
+a ByteLRUCache (utils/byte_cache.py): an approximate byte budget with LRU eviction.
+"""
+import functools
+import inspect
+import sys
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+import streamlit as st
+
+from utils.byte_cache import ByteLRUCache, sizeof
+from utils.config import get_config
+
+DEFAULT_BUDGET_MB = 32
+
+_status = threading.local()
+
+
+# ----------------------------------------------------
+# Status messages that survive worker threads and cache hits
+# ----------------------------------------------------
+def show_status(kind: str, message: str):
+    """
+    st.<kind>(message) (info/success/warning/error), also recorded by every
+    active capture_status(). Inside a quiet capture nothing is drawn.
+    """
+    captures = getattr(_status, "captures", [])
+    for messages, _ in captures:
+        messages.append((kind, message))
+    if not any(quiet for _, quiet in captures):
+        getattr(st, kind)(message)
+
+
+@contextmanager
+def capture_status(quiet: bool = False):
+    if not hasattr(_status, "captures"):
+        _status.captures = []
+    messages = []
+    _status.captures.append((messages, quiet))
+    try:
+        yield messages
+    finally:
+        _status.captures.pop()
+
+
+def replay_status(messages):
+    for kind, message in messages:
+        show_status(kind, message)
+
+
+def run_captured(func, *args, **kwargs):
+    """
+    For worker threads (no script context): returns (result, status messages)
+    instead of drawing them; show them later from the script with replay_status.
+    """
+    with capture_status(quiet=True) as messages:
+        result = func(*args, **kwargs)
+    return result, messages
+
+
+def freeze_names(names) -> tuple:
+    return tuple(sys.intern(str(n)) for n in names)
+
+
+class PlaceGroups(Mapping):
+    """
+    Read-only {category: (names...)} with no per-instance dict.
+    Behaves like the dicts it replaces (.items(), .get(), truthiness, ...).
+    """
+
+    __slots__ = ("_keys", "_values")
+
+    def __init__(self, data: dict):
+        self._keys = tuple(sys.intern(str(k)) for k in data)
+        self._values = tuple(freeze_names(v) for v in data.values())
+
+    def __getitem__(self, key):
+        try:
+            return self._values[self._keys.index(key)]
+        except ValueError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def items(self):
+        return zip(self._keys, self._values)
+
+    def values(self):
+        return self._values
+
+    def __repr__(self):
+        return f"PlaceGroups({dict(self.items())!r})"
+
+
+def freeze(value):
+    """
+    list of names -> tuple, {category: [names]} -> PlaceGroups, anything else unchanged.
+    """
+    if isinstance(value, (list, tuple)):
+        return freeze_names(value)
+    if isinstance(value, dict):
+        return PlaceGroups(value)
+    return value
+
+
+def _sizeof(obj) -> int:
+    # interned names are shared between entries, so this over-counts; the budget errs on the safe side
+    if isinstance(obj, PlaceGroups):
+        size = sys.getsizeof(obj)
+        size += sys.getsizeof(obj._keys) + sum(sys.getsizeof(k) for k in obj._keys)
+        size += sys.getsizeof(obj._values) + sum(_sizeof(v) for v in obj._values)
+        return size
+    if isinstance(obj, tuple):
+        return sys.getsizeof(obj) + sum(_sizeof(x) for x in obj)
+    return sizeof(obj)
+
+
+@st.cache_resource(show_spinner=False)
+def get_place_cache() -> ByteLRUCache:
+    """
+    One cache per process, shared by all sessions. PLACE_CACHE_MB sets the budget.
+    """
+    budget_mb = float(get_config("PLACE_CACHE_MB", DEFAULT_BUDGET_MB))
+    return ByteLRUCache(int(budget_mb * 1024 * 1024), sizeof=_sizeof)
+
+
+def cached(ttl: float):
+    """
+    Drop-in for @st.cache_data(ttl=...) on place lookups. Results are frozen
+    (see freeze) and returned without copying, so callers must not mutate them.
+    Like st.cache_data, status messages (show_status) are replayed on a hit.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (func.__qualname__,) + tuple(bound.arguments.values())
+
+            cache = get_place_cache()
+            hit, entry = cache.get(key)
+            if not hit:
+                lock = cache.key_lock(key)
+                try:
+                    with lock:
+                        hit, entry = cache.get(key, count=False)
+                        if not hit:
+                            with capture_status() as messages:
+                                value = freeze(func(*args, **kwargs))
+                            cache.put(key, (value, tuple(messages)), ttl)
+                            return value
+                finally:
+                    cache.release_key_lock(key, lock)
+
+            value, messages = entry
+            replay_status(messages)
+            return value
+
+        return wrapper
+
+    return decorator
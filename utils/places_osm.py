@@ -1,7 +1,19 @@
+import math
+import os
 import requests
 import streamlit as st
 import re
 
+from utils.config import get_config
+from utils.gazetteer import Gazetteer
+from utils.place_cache import cached, show_status
+
+# Overridable so the app can run against a mirror / local stand-ins (scripts/loadtest.py)
+NOMINATIM_URL = get_config("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+OVERPASS_URL = get_config("OVERPASS_URL", "https://overpass-api.de/api/interpreter")
+
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "gazetteer.idx")
+
 
 def is_valid_tourist_place(name: str) -> bool:
     if not name:
@@ -60,7 +72,7 @@ def search_cities(query: str, limit: int = 8):
     if not query or len(query) < 2:
         return []
 
-    url = "https://nominatim.openstreetmap.org/search"
+    url = NOMINATIM_URL
     params = {"q": query, "format": "json", "addressdetails": 1, "limit": limit}
     headers = {"User-Agent": "AITravelPlanner/1.0 (streamlit app)"}
 
@@ -81,6 +93,23 @@ def search_cities(query: str, limit: int = 8):
     return uniq(suggestions)
 
 
+@st.cache_resource(show_spinner=False)
+def get_gazetteer():
+    """
+    Offline gazetteer (see utils/gazetteer.py), or None if no index was built.
+    Path: GAZETTEER_PATH in env / secrets, default data/gazetteer.idx ("off" disables it).
+    """
+    path = get_config("GAZETTEER_PATH", DEFAULT_GAZETTEER_PATH)
+    if not path or path == "off" or not os.path.exists(path):
+        return None
+
+    try:
+        return Gazetteer(path)
+    except Exception as e:
+        show_status("warning", f"⚠️ Offline gazetteer unavailable ({e}), using Nominatim only.")
+        return None
+
+
 def clean_city_name(full_location: str) -> str:
     if not full_location:
         return ""
@@ -92,19 +121,42 @@ def clean_city_name(full_location: str) -> str:
         city = city.replace(w, "").strip()
 
     city = re.sub(r"\s+", " ", city).strip()
+
+    # canonical spelling for known cities ("bangalore" -> "Bengaluru")
+    gazetteer = get_gazetteer()
+    if gazetteer and city:
+        match = gazetteer.lookup(city)
+        if match:
+            return match["name"]
+
     return city
 
 
-@st.cache_data(ttl=86400)
 def geocode_city(city: str):
     """
-    IMPROVED: Better error handling and debugging
+    Common cities resolve from the offline gazetteer (microseconds);
+    everything else falls back to Nominatim.
     """
     if not city:
-        st.warning("⚠️ Empty city name provided to geocode_city()")
+        show_status("warning", "⚠️ Empty city name provided to geocode_city()")
         return None
 
-    url = "https://nominatim.openstreetmap.org/search"
+    gazetteer = get_gazetteer()
+    if gazetteer:
+        match = gazetteer.lookup(city)
+        if match:
+            return match["lat"], match["lon"]
+
+    return _geocode_nominatim(city)
+
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def _geocode_nominatim(city: str):
+    """
+    IMPROVED: Better error handling and debugging
+    """
+
+    url = NOMINATIM_URL
     params = {"q": city, "format": "json", "limit": 1}
     headers = {"User-Agent": "AITravelPlanner/1.0 (streamlit app)"}
 
@@ -114,236 +166,339 @@ def geocode_city(city: str):
         data = r.json()
         
         if not data:
-            st.error(f"🔍 Geocoding failed: No results for '{city}'")
-            st.info("💡 Try: Full city name with country (e.g., 'Paris, France')")
+            show_status("error", f"🔍 Geocoding failed: No results for '{city}'")
+            show_status("info", "💡 Try: Full city name with country (e.g., 'Paris, France')")
             return None
             
         lat, lon = float(data[0]["lat"]), float(data[0]["lon"])
-        st.success(f"✅ Geocoded '{city}' → {lat:.4f}, {lon:.4f}")
+        show_status("success", f"✅ Geocoded '{city}' → {lat:.4f}, {lon:.4f}")
         return lat, lon
         
     except requests.exceptions.Timeout:
-        st.error(f"⏱️ Geocoding timeout for '{city}'. Try again.")
+        show_status("error", f"⏱️ Geocoding timeout for '{city}'. Try again.")
         return None
     except Exception as e:
-        st.error(f"❌ Geocoding error for '{city}': {str(e)}")
+        show_status("error", f"❌ Geocoding error for '{city}': {str(e)}")
         return None
 
 
-@st.cache_data(ttl=86400)
-def get_attractions_osm(city: str, limit: int = 15, radius_m: int = 30000):
+# ----------------------------------------------------
+# Overpass queries: per-category output limits + adaptive radius
+# ----------------------------------------------------
+# Filters per category; "{a}" is replaced by the around() clause.
+# _build_category_query adds ["name"] to each: unnamed elements are useless
+# and must not use up the per-category `out tags N` limit.
+ATTRACTION_FILTERS = {
+    "Attractions": [
+        'node{a}["tourism"="attraction"]',
+        'node{a}["tourism"="museum"]',
+        'node{a}["tourism"="gallery"]',
+        'node{a}["tourism"="viewpoint"]',
+        'node{a}["historic"]',
+        'node{a}["man_made"="lighthouse"]',
+        'node{a}["natural"="beach"]',
+        'node{a}["leisure"="park"]',
+    ],
+}
+
+CITY_CATEGORY_FILTERS = {
+    "Beaches 🏖️": ['node{a}["natural"="beach"]', 'way{a}["natural"="beach"]'],
+    "Hill Stations / Viewpoints ⛰️": ['node{a}["natural"="peak"]', 'node{a}["tourism"="viewpoint"]'],
+    "Waterfalls 🌊": ['node{a}["waterway"="waterfall"]', 'node{a}["natural"="waterfall"]'],
+    "Adventure / Fun 🎢": [
+        'node{a}["leisure"="water_park"]',
+        'node{a}["tourism"="theme_park"]',
+        'node{a}["tourism"="zoo"]',
+    ],
+    "Culture / History 🏛️": ['node{a}["historic"]', 'node{a}["tourism"="museum"]'],
+}
+
+DAY_TRIP_FILTERS = {
+    "Nearby Hill/Nature Trips ⛰️": ['node{a}["tourism"="viewpoint"]', 'node{a}["natural"="peak"]'],
+    "Nearby Waterfalls 🌿": ['node{a}["waterway"="waterfall"]'],
+    "Nearby Beaches 🏖️": ['node{a}["natural"="beach"]'],
+    "Special Places ✨": ['node{a}["tourism"="attraction"]', 'node{a}["historic"]'],
+}
+
+# Raw elements fetched per wanted place: some are filtered out by
+# is_valid_tourist_place() or are duplicates.
+OVERFETCH = 4
+
+DENSITY_PROBE_RADIUS_M = 5000
+
+# tourism=* values that are lodging, not sights: excluded from the density
+# probe so hotel-heavy cities don't look dense in sights
+ACCOMMODATION_RE = "^(hotel|guest_house|hostel|motel|apartment|camp_site)$"
+
+# Day trips should leave the city, so their search never starts below this
+DAY_TRIP_MIN_RADIUS_M = 50000
+
+
+def _overpass_timeout(radius_m: int, max_timeout: int) -> int:
+    # small radius -> small query -> fail fast instead of waiting 60-90 s
+    return int(min(max_timeout, 25 + radius_m / 4000))
+
+
+def _build_category_query(filters: dict, radius_m: int, lat: float, lon: float,
+                          limit_each: int, timeout: int) -> str:
     """
-    IMPROVED: Added debugging and fallback handling
+    One union + `out tags N;` per category, so the server never sends more
+    than N elements for any category (the 200 km query used to return
+    thousands to keep 8). Only named elements are selected, so N counts
+    usable places.
     """
-    st.info(f"🔍 Searching attractions in '{city}' (radius: {radius_m/1000}km)...")
-    
-    coords = geocode_city(city)
-    if not coords:
-        return []
+    around = f"(around:{radius_m},{lat},{lon})"
+    blocks = []
+    for selectors in filters.values():
+        body = "\n      ".join(sel.format(a=around) + '["name"];' for sel in selectors)
+        blocks.append(f"""    (
+      {body}
+    );
+    out tags {limit_each * OVERFETCH};""")
+
+    return f"[out:json][timeout:{timeout}];\n" + "\n".join(blocks)
 
-    lat, lon = coords
-    overpass_url = "https://overpass-api.de/api/interpreter"
 
+def _run_overpass(query: str, timeout: int) -> list:
+    response = requests.get(OVERPASS_URL, params={"data": query}, timeout=timeout + 5)
+    response.raise_for_status()
+    return response.json().get("elements", [])
+
+
+@st.cache_data(ttl=7 * 86400, show_spinner=False)
+def estimate_poi_density(lat: float, lon: float) -> float:
+    """
+    Named tourism/historic POIs per km² around (lat, lon), lodging excluded,
+    from a cheap `out count` query. Callers round the coordinates so the
+    estimate is cached per region.
+    Overpass errors propagate, so a transient failure is not cached.
+    """
+    r = DENSITY_PROBE_RADIUS_M
     query = f"""
-    [out:json][timeout:60];
+    [out:json][timeout:25];
     (
-      node(around:{radius_m},{lat},{lon})["tourism"="attraction"];
-      node(around:{radius_m},{lat},{lon})["tourism"="museum"];
-      node(around:{radius_m},{lat},{lon})["tourism"="gallery"];
-      node(around:{radius_m},{lat},{lon})["tourism"="viewpoint"];
-      node(around:{radius_m},{lat},{lon})["historic"];
-      node(around:{radius_m},{lat},{lon})["man_made"="lighthouse"];
-      node(around:{radius_m},{lat},{lon})["natural"="beach"];
-      node(around:{radius_m},{lat},{lon})["leisure"="park"];
+      node(around:{r},{lat},{lon})["tourism"]["tourism"!~"{ACCOMMODATION_RE}"]["name"];
+      node(around:{r},{lat},{lon})["historic"]["name"];
     );
-    out tags;
+    out count;
     """
 
+    elements = _run_overpass(query, timeout=25)
+    total = int(elements[0]["tags"]["total"]) if elements else 0
+
+    return total / (math.pi * (r / 1000) ** 2)
+
+
+def adaptive_radii(lat: float, lon: float, wanted: int, max_radius_m: int, min_radius_m: int = 5000) -> list:
+    """
+    Radius schedule for an adaptive search: start where the region's POI
+    density says `wanted` places should be (dense metro -> a few km), then
+    double until max_radius_m.
+    """
+    # ~0.25° cells (~25 km) share one density estimate
     try:
-        response = requests.get(overpass_url, params={"data": query}, timeout=60)
-        response.raise_for_status()
-        data = response.json()
-        
-        total_found = len(data.get("elements", []))
-        st.info(f"📊 OSM returned {total_found} raw elements")
-        
+        density = estimate_poi_density(round(lat * 4) / 4, round(lon * 4) / 4)
+    except Exception:
+        density = 0.0  # probe failed: use the fallback schedule this time only
+
+    if density > 0:
+        start = math.sqrt(wanted * OVERFETCH / (math.pi * density)) * 1000
+    else:
+        start = max_radius_m / 4
+
+    start = int(min(max(start, min_radius_m), max_radius_m))
+
+    radii = []
+    r = start
+    while r < max_radius_m:
+        radii.append(r)
+        r *= 2
+    radii.append(max_radius_m)
+    return radii
+
+
+def _fetch_categories(filters: dict, classify, lat: float, lon: float, radius_m: int,
+                      limit_each: int, adaptive: bool, min_radius_m: int, max_timeout: int):
+    """
+    Query Overpass for every category in `filters` and bucket the named
+    elements with classify(tags) -> category label (or None).
+
+    adaptive=False: one query at radius_m.
+    adaptive=True:  radius_m is the maximum; start from the density estimate
+                    and grow, re-querying only categories still short of
+                    limit_each.
+    Returns ({label: [names]}, raw element count, last radius used).
+    """
+    found = {label: [] for label in filters}
+
+    if adaptive:
+        radii = adaptive_radii(lat, lon, limit_each * len(filters), radius_m, min_radius_m)
+    else:
+        radii = [radius_m]
+
+    pending = list(filters)
+    raw_total = 0
+    used_radius = radii[0]
+
+    for r in radii:
+        used_radius = r
+        timeout = _overpass_timeout(r, max_timeout)
+        query = _build_category_query({k: filters[k] for k in pending}, r, lat, lon, limit_each, timeout)
+        elements = _run_overpass(query, timeout)
+        raw_total += len(elements)
+
+        for element in elements:
+            tags = element.get("tags", {})
+            name = tags.get("name")
+            if not name:
+                continue
+
+            label = classify(tags, name)
+            if label in found:
+                found[label].append(name)
+
+        found = {k: uniq(v) for k, v in found.items()}
+        pending = [k for k in filters if len(found[k]) < limit_each]
+        if not pending:
+            break
+
+    return {k: v[:limit_each] for k, v in found.items()}, raw_total, used_radius
+
+
+def _classify_attraction(tags: dict, name: str):
+    return "Attractions" if is_valid_tourist_place(name) else None
+
+
+def _classify_city_category(tags: dict, name: str):
+    if tags.get("natural") == "beach":
+        return "Beaches 🏖️"
+
+    if not is_valid_tourist_place(name):
+        return None
+
+    if tags.get("tourism") == "viewpoint" or tags.get("natural") in ["peak", "hill"]:
+        return "Hill Stations / Viewpoints ⛰️"
+    if tags.get("waterway") == "waterfall" or tags.get("natural") == "waterfall":
+        return "Waterfalls 🌊"
+    if tags.get("leisure") == "water_park" or tags.get("tourism") in ["theme_park", "zoo", "attraction"]:
+        return "Adventure / Fun 🎢"
+    if tags.get("historic") is not None or tags.get("tourism") in ["museum", "gallery"]:
+        return "Culture / History 🏛️"
+    return None
+
+
+def _classify_day_trip(tags: dict, name: str):
+    if tags.get("natural") == "beach":
+        return "Nearby Beaches 🏖️"
+
+    if not is_valid_tourist_place(name):
+        return None
+
+    if tags.get("tourism") == "viewpoint" or tags.get("natural") in ["peak", "hill"]:
+        return "Nearby Hill/Nature Trips ⛰️"
+    if tags.get("waterway") == "waterfall" or tags.get("natural") == "waterfall":
+        return "Nearby Waterfalls 🌿"
+    if tags.get("tourism") == "attraction" or tags.get("historic") is not None:
+        return "Special Places ✨"
+    return None
+
+
+@cached(ttl=86400)
+def get_attractions_osm(city: str, limit: int = 15, radius_m: int = 30000, adaptive: bool = False):
+    """
+    IMPROVED: Added debugging and fallback handling
+    adaptive=True treats radius_m as the maximum and sizes the search from POI density.
+    """
+    mode = "adaptive, max" if adaptive else "radius"
+    show_status("info", f"🔍 Searching attractions in '{city}' ({mode}: {radius_m/1000}km)...")
+
+    coords = geocode_city(city)
+    if not coords:
+        return []
+
+    lat, lon = coords
+
+    try:
+        found, total_found, used_radius = _fetch_categories(
+            ATTRACTION_FILTERS, _classify_attraction, lat, lon, radius_m,
+            limit_each=limit, adaptive=adaptive, min_radius_m=5000, max_timeout=60,
+        )
+        show_status("info", f"📊 OSM returned {total_found} raw elements (radius {used_radius/1000:.0f}km)")
+
     except requests.exceptions.Timeout:
-        st.error("⏱️ OSM API timeout. Try reducing radius or try again later.")
+        show_status("error", "⏱️ OSM API timeout. Try reducing radius or try again later.")
         return []
     except Exception as e:
-        st.error(f"❌ OSM query failed: {str(e)}")
+        show_status("error", f"❌ OSM query failed: {str(e)}")
         return []
 
-    places = []
-    filtered_out = 0
-    
-    for element in data.get("elements", []):
-        tags = element.get("tags", {})
-        name = tags.get("name")
-        
-        if not name:
-            continue
-            
-        if is_valid_tourist_place(name):
-            places.append(name)
-        else:
-            filtered_out += 1
-
-    unique_places = uniq(places)[:limit]
-    
-    st.success(f"✅ Found {len(unique_places)} valid attractions (filtered {filtered_out})")
-    
+    unique_places = found["Attractions"]
+
+    show_status("success", f"✅ Found {len(unique_places)} valid attractions")
+
     if len(unique_places) == 0:
-        st.warning(f"⚠️ No attractions found. Try:\n- Larger radius\n- Nearby bigger city\n- Check spelling")
-    
+        show_status("warning", f"⚠️ No attractions found. Try:\n- Larger radius\n- Nearby bigger city\n- Check spelling")
+
     return unique_places
 
 
-@st.cache_data(ttl=86400)
-def get_city_categories(city: str, radius_m: int = 40000, limit_each: int = 10):
+@cached(ttl=86400)
+def get_city_categories(city: str, radius_m: int = 40000, limit_each: int = 10, adaptive: bool = False):
     """
     IMPROVED: Better debugging
+    adaptive=True treats radius_m as the maximum and sizes the search from POI density.
     """
-    st.info(f"🏖️ Searching categories in '{city}' (radius: {radius_m/1000}km)...")
-    
+    mode = "adaptive, max" if adaptive else "radius"
+    show_status("info", f"🏖️ Searching categories in '{city}' ({mode}: {radius_m/1000}km)...")
+
     coords = geocode_city(city)
     if not coords:
         return {}
 
     lat, lon = coords
-    overpass_url = "https://overpass-api.de/api/interpreter"
-
-    query = f"""
-    [out:json][timeout:80];
-    (
-      node(around:{radius_m},{lat},{lon})["natural"="beach"];
-      way(around:{radius_m},{lat},{lon})["natural"="beach"];
-      node(around:{radius_m},{lat},{lon})["natural"="peak"];
-      node(around:{radius_m},{lat},{lon})["tourism"="viewpoint"];
-      node(around:{radius_m},{lat},{lon})["waterway"="waterfall"];
-      node(around:{radius_m},{lat},{lon})["natural"="waterfall"];
-      node(around:{radius_m},{lat},{lon})["leisure"="water_park"];
-      node(around:{radius_m},{lat},{lon})["tourism"="theme_park"];
-      node(around:{radius_m},{lat},{lon})["tourism"="zoo"];
-      node(around:{radius_m},{lat},{lon})["historic"];
-      node(around:{radius_m},{lat},{lon})["tourism"="museum"];
-    );
-    out tags;
-    """
 
     try:
-        response = requests.get(overpass_url, params={"data": query}, timeout=80)
-        response.raise_for_status()
-        data = response.json()
-        st.info(f"📊 Categories query returned {len(data.get('elements', []))} elements")
+        result, total_found, used_radius = _fetch_categories(
+            CITY_CATEGORY_FILTERS, _classify_city_category, lat, lon, radius_m,
+            limit_each=limit_each, adaptive=adaptive, min_radius_m=5000, max_timeout=80,
+        )
+        show_status("info", f"📊 Categories query returned {total_found} elements (radius {used_radius/1000:.0f}km)")
     except Exception as e:
-        st.error(f"❌ Categories query failed: {str(e)}")
+        show_status("error", f"❌ Categories query failed: {str(e)}")
         return {}
 
-    beaches, hills, waterfalls, adventure, culture = [], [], [], [], []
-
-    for element in data.get("elements", []):
-        tags = element.get("tags", {})
-        name = tags.get("name")
-        if not name:
-            continue
-
-        if tags.get("natural") == "beach":
-            beaches.append(name)
-            continue
-
-        if not is_valid_tourist_place(name):
-            continue
-
-        if tags.get("tourism") == "viewpoint" or tags.get("natural") in ["peak", "hill"]:
-            hills.append(name)
-        elif tags.get("waterway") == "waterfall" or tags.get("natural") == "waterfall":
-            waterfalls.append(name)
-        elif tags.get("leisure") == "water_park" or tags.get("tourism") in ["theme_park", "zoo", "attraction"]:
-            adventure.append(name)
-        elif tags.get("historic") is not None or tags.get("tourism") in ["museum", "gallery"]:
-            culture.append(name)
-
-    result = {
-        "Beaches 🏖️": uniq(beaches)[:limit_each],
-        "Hill Stations / Viewpoints ⛰️": uniq(hills)[:limit_each],
-        "Waterfalls 🌊": uniq(waterfalls)[:limit_each],
-        "Adventure / Fun 🎢": uniq(adventure)[:limit_each],
-        "Culture / History 🏛️": uniq(culture)[:limit_each],
-    }
-    
     total_places = sum(len(v) for v in result.values())
-    st.success(f"✅ Categorized {total_places} places")
-    
+    show_status("success", f"✅ Categorized {total_places} places")
+
     return result
 
 
-@st.cache_data(ttl=86400)
-def get_nearby_day_trips(city: str, radius_m: int = 200000, limit_each: int = 10):
+@cached(ttl=86400)
+def get_nearby_day_trips(city: str, radius_m: int = 200000, limit_each: int = 10, adaptive: bool = False):
     """
     IMPROVED: Better debugging
+    adaptive=True treats radius_m as the maximum and sizes the search from POI density.
     """
-    st.info(f"🚗 Searching day trips near '{city}' (radius: {radius_m/1000}km)...")
-    
+    mode = "adaptive, max" if adaptive else "radius"
+    show_status("info", f"🚗 Searching day trips near '{city}' ({mode}: {radius_m/1000}km)...")
+
     coords = geocode_city(city)
     if not coords:
         return {}
 
     lat, lon = coords
-    overpass_url = "https://overpass-api.de/api/interpreter"
-
-    query = f"""
-    [out:json][timeout:90];
-    (
-      node(around:{radius_m},{lat},{lon})["tourism"="attraction"];
-      node(around:{radius_m},{lat},{lon})["historic"];
-      node(around:{radius_m},{lat},{lon})["tourism"="viewpoint"];
-      node(around:{radius_m},{lat},{lon})["natural"="peak"];
-      node(around:{radius_m},{lat},{lon})["waterway"="waterfall"];
-      node(around:{radius_m},{lat},{lon})["natural"="beach"];
-    );
-    out tags;
-    """
 
     try:
-        response = requests.get(overpass_url, params={"data": query}, timeout=90)
-        response.raise_for_status()
-        data = response.json()
-        st.info(f"📊 Day trips query returned {len(data.get('elements', []))} elements")
+        result, total_found, used_radius = _fetch_categories(
+            DAY_TRIP_FILTERS, _classify_day_trip, lat, lon, radius_m,
+            limit_each=limit_each, adaptive=adaptive, min_radius_m=DAY_TRIP_MIN_RADIUS_M, max_timeout=90,
+        )
+        show_status("info", f"📊 Day trips query returned {total_found} elements (radius {used_radius/1000:.0f}km)")
     except Exception as e:
-        st.error(f"❌ Day trips query failed: {str(e)}")
+        show_status("error", f"❌ Day trips query failed: {str(e)}")
         return {}
 
-    hills, nature, beaches, special = [], [], [], []
-
-    for element in data.get("elements", []):
-        tags = element.get("tags", {})
-        name = tags.get("name")
-        if not name:
-            continue
-
-        if tags.get("natural") == "beach":
-            beaches.append(name)
-            continue
-
-        if not is_valid_tourist_place(name):
-            continue
-
-        if tags.get("tourism") == "viewpoint" or tags.get("natural") in ["peak", "hill"]:
-            hills.append(name)
-        elif tags.get("waterway") == "waterfall" or tags.get("natural") == "waterfall":
-            nature.append(name)
-        elif tags.get("tourism") == "attraction" or tags.get("historic") is not None:
-            special.append(name)
-
-    result = {
-        "Nearby Hill/Nature Trips ⛰️": uniq(hills)[:limit_each],
-        "Nearby Waterfalls 🌿": uniq(nature)[:limit_each],
-        "Nearby Beaches 🏖️": uniq(beaches)[:limit_each],
-        "Special Places ✨": uniq(special)[:limit_each],
-    }
-    
     total_places = sum(len(v) for v in result.values())
-    st.success(f"✅ Found {total_places} day trip destinations")
-    
-    return result
\ No newline at end of file
+    show_status("success", f"✅ Found {total_places} day trip destinations")
+
+    return result
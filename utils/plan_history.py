@@ -0,0 +1,131 @@
+"""
+Plan history.
+
+Every generated plan goes into one server-wide store, compressed (zstd when
+the optional zstandard package is installed, zlib otherwise) and keyed by a
+hash of its content, so the same plan reached from several sessions is kept
+once. LLM outputs are also stored under a hash of everything that went into
+the call, so going back to a variant that any session already generated
+skips the LLM. A session itself only keeps plan ids and labels.
+"""
+import hashlib
+import zlib
+
+import streamlit as st
+
+from utils.byte_cache import ByteLRUCache
+from utils.config import get_config
+from utils.export_pdf import generate_pdf_bytes
+from utils.llm import get_backend
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_BUDGET_MB = 64
+PLAN_TTL = 7 * 86400
+MAX_SESSION_PLANS = 50
+
+
+def _pack(data: bytes) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 9)
+
+
+def _unpack(data: bytes) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _hash(*parts) -> str:
+    return hashlib.sha256("\x00".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+
+
+@st.cache_resource
+def get_plan_store() -> ByteLRUCache:
+    """
+    Server-wide, byte-bounded LRU. PLAN_STORE_MB sets the budget.
+    """
+    budget_mb = float(get_config("PLAN_STORE_MB", DEFAULT_BUDGET_MB))
+    return ByteLRUCache(int(budget_mb * 1024 * 1024))
+
+
+# ----------------------------------------------------
+# LLM outputs, deduplicated by prompt hash
+# ----------------------------------------------------
+def output_key(*parts) -> str:
+    """
+    Hash of the backend/model plus everything passed to the LLM
+    (prefix hash, prompt, temperature, ...).
+    """
+    backend = get_backend()
+    return _hash(type(backend).__name__, getattr(backend, "model", ""), *parts)
+
+
+def get_output(key: str):
+    hit, packed = get_plan_store().get(("output", key))
+    return _unpack(packed).decode("utf-8") if hit else None
+
+
+def put_output(key: str, text: str):
+    get_plan_store().put(("output", key), _pack(text.encode("utf-8")), PLAN_TTL)
+
+
+# ----------------------------------------------------
+# Plans + PDFs, per-session history
+# ----------------------------------------------------
+def save_plan(plan_text: str, title: str, label: str) -> tuple:
+    """
+    Store the plan (once per content) and add it to this session's history.
+    Returns the history entry (plan_id, label).
+    """
+    plan_id = _hash(title, plan_text)
+    store = get_plan_store()
+    hit, _ = store.get(("plan", plan_id), count=False)
+    if not hit:
+        store.put(("plan", plan_id), (title, _pack(plan_text.encode("utf-8"))), PLAN_TTL)
+
+    # variants that produced the same text share the stored plan but keep their own entry
+    entry = (plan_id, label)
+    history = [h for h in st.session_state.get("plan_history", []) if h != entry]
+    history.append(entry)
+    st.session_state["plan_history"] = history[-MAX_SESSION_PLANS:]
+    return entry
+
+
+def load_plan(plan_id: str):
+    """
+    (title, plan_text), or None once the plan has been evicted.
+    """
+    hit, record = get_plan_store().get(("plan", plan_id))
+    if not hit:
+        return None
+    title, packed = record
+    return title, _unpack(packed).decode("utf-8")
+
+
+def get_plan_pdf(plan_id: str, title: str, plan_text: str) -> bytes:
+    """
+    PDF for a stored plan, rendered once and then served from the store.
+    """
+    store = get_plan_store()
+    hit, packed = store.get(("pdf", plan_id))
+    if hit:
+        return _unpack(packed)
+
+    pdf_bytes = generate_pdf_bytes(title=title, content=plan_text)
+    store.put(("pdf", plan_id), _pack(pdf_bytes), PLAN_TTL)
+    return pdf_bytes
+
+
+def session_history() -> list:
+    """
+    [(plan_id, label)] for plans of this session that are still stored, oldest first.
+    """
+    store = get_plan_store()
+    history = [h for h in st.session_state.get("plan_history", []) if store.get(("plan", h[0]), count=False)[0]]
+    st.session_state["plan_history"] = history
+    return history
@@ -0,0 +1,96 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from utils.place_cache import run_captured, replay_status
+from utils.places_osm import geocode_city, get_attractions_osm
+
+
+@st.cache_resource
+def get_executor():
+    """
+    One small thread pool shared by all sessions for background prefetches.
+    """
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="prefetch")
+
+
+# Workers have no script context: they return (result, status messages)
+# and the messages are shown when the script picks the result up.
+def _fetch_attractions(city: str, cancelled: threading.Event):
+    if cancelled.is_set():
+        return [], []
+    return run_captured(get_attractions_osm, city, limit=12, radius_m=50000, adaptive=True)
+
+
+def _geocode(place: str, cancelled: threading.Event):
+    if not place or cancelled.is_set():
+        return None, []
+    return run_captured(geocode_city, place)
+
+
+class PrefetchJob:
+    """
+    Everything "Generate Travel Plan" needs apart from the LLM call,
+    started in the background for one (destination, departure) selection.
+    """
+
+    def __init__(self, destination_city: str, departure_full: str):
+        self.key = (destination_city, departure_full)
+        self.cancelled = threading.Event()
+
+        pool = get_executor()
+        self.futures = {
+            "attractions": pool.submit(_fetch_attractions, destination_city, self.cancelled),
+            "dest_coords": pool.submit(_geocode, destination_city, self.cancelled),
+            "dep_coords": pool.submit(_geocode, departure_full, self.cancelled),
+        }
+
+    def cancel(self):
+        # queued tasks are dropped; running ones finish but their result is ignored
+        self.cancelled.set()
+        for f in self.futures.values():
+            f.cancel()
+
+    def result(self, name: str, timeout: float = None):
+        """
+        Wait for one result and show the status messages it produced.
+        """
+        value, messages = self.futures[name].result(timeout=timeout)
+        replay_status(messages)
+        return value
+
+
+def start_prefetch(destination_city: str, departure_full: str):
+    """
+    Start (or keep) the prefetch for the current selection.
+
+    Streamlit only reruns the script once a widget value is committed
+    (selectbox pick, Enter/blur on a text input), so a new key here means the
+    selection has settled. A job for an older selection is cancelled.
+    """
+    if not destination_city or len(destination_city) < 2:
+        return None
+
+    key = (destination_city, departure_full)
+    job = st.session_state.get("prefetch_job")
+
+    if job is not None and job.key == key:
+        return job
+
+    if job is not None:
+        job.cancel()
+
+    job = PrefetchJob(destination_city, departure_full)
+    st.session_state["prefetch_job"] = job
+    return job
+
+
+def get_prefetch(destination_city: str, departure_full: str):
+    """
+    Return the running/finished job for this selection, or None.
+    """
+    job = st.session_state.get("prefetch_job")
+    if job is not None and job.key == (destination_city, departure_full) and not job.cancelled.is_set():
+        return job
+    return None
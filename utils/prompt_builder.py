@@ -1,3 +1,71 @@
+import hashlib
+
+# Bump whenever any static prefix below changes, so caches keyed on it roll over.
+PROMPT_VERSION = "3"
+
+SYSTEM_MESSAGE = "You are a professional travel planner. Always complete all sections fully."
+
+# Static prefixes: byte-identical for every request (no per-trip values), sent
+# as the system message so backends with prefix/KV caching reuse them.
+# Per-trip data always comes after, in the user message.
+STATIC_PREFIX = SYSTEM_MESSAGE + """
+
+You will get TRIP DETAILS and AVAILABLE PLACES. Create a day-wise itinerary for the destination and number of days given.
+
+RULES:
+1. Use ONLY places listed under AVAILABLE PLACES (no invented names)
+2. 2-4 places per day (realistic pace)
+3. Prefer tourist attractions over residential areas
+4. Include timings and costs in the trip currency
+5. Include all sections below (transport and budget are added separately, do not write them)
+
+OUTPUT FORMAT:
+
+## Day-wise Itinerary
+Day 1: [Morning/Afternoon/Evening activities]
+Day 2: ...
+[Continue for all days of the trip]
+
+## Food Recommendations
+- 5 local dishes
+- 3 restaurants/areas
+- Budget + premium options
+
+## Travel Tips
+- Best time to visit
+- Safety tips
+- Packing essentials"""
+
+STRUCTURED_PREFIX = SYSTEM_MESSAGE + """
+
+You will get TRIP DETAILS and AVAILABLE PLACES. Create a day-wise itinerary for the destination and number of days given.
+
+RULES:
+1. Use ONLY places listed under AVAILABLE PLACES, spelled exactly as listed
+2. 2-4 places per day (realistic pace)
+3. Include timings and costs in the trip currency
+4. Output ONLY JSON objects, one per line, no markdown, no extra text
+5. Transport and budget are added separately, do not write them
+
+OUTPUT FORMAT (one line per object, in this order):
+{"type": "day", "day": 1, "title": "...", "places": ["..."], "morning": "...", "afternoon": "...", "evening": "..."}
+[one "day" object for each day of the trip]
+{"type": "food", "items": ["5 local dishes", "3 restaurants/areas", "budget + premium options"]}
+{"type": "tips", "items": ["best time to visit", "safety tips", "packing essentials"]}"""
+
+
+def prefix_hash(prefix: str) -> str:
+    """
+    Short content hash of a static prefix (versioned), e.g. f"v{PROMPT_VERSION}-3f9a1c0b7d2e4a61".
+    """
+    digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
+    return f"v{PROMPT_VERSION}-{digest}"
+
+
+PREFIX_HASH = prefix_hash(STATIC_PREFIX)
+STRUCTURED_PREFIX_HASH = prefix_hash(STRUCTURED_PREFIX)
+
+
 def _format_list(items, fallback="- Not available"):
     if not items:
         return fallback
@@ -48,22 +116,19 @@ def build_prompt(
 ) -> str:
     """
     OPTIMIZED: Shorter prompt to leave more tokens for response generation.
+    Returns only the per-trip part; send it with system=STATIC_PREFIX.
     """
 
     currency = (currency or "INR").strip().upper()
     interests_text = ", ".join(interests) if interests else "General"
-    
-    # LIMIT attractions to top 8 to save tokens
-    attractions_text = _format_list(attractions[:8], fallback="- Not available")
-    
+
     # LIMIT categories (already limited to 5 per category in _format_dict_sections)
     city_categories_text = _format_dict_sections(city_categories, fallback="Not available")
     nearby_trips_text = _format_dict_sections(nearby_trips, fallback="Not available")
 
-    # STREAMLINED PROMPT - removed redundant rules
-    prompt = f"""You are a travel planner. Create a {days}-day itinerary for {destination_city}.
-
-TRIP DETAILS:
+    prompt = f"""TRIP DETAILS:
+- Destination: {destination_city}
+- Days: {days}
 - Departure: {departure_full}
 - Budget: {budget} | Transport: {transport_pref}
 - Interests: {interests_text}
@@ -74,40 +139,117 @@ AVAILABLE PLACES:
 {city_categories_text}
 
 {nearby_trips_text}
+"""
+    return prompt.strip()
 
-RULES:
-1. Use ONLY places listed above (no invented names)
-2. 2-4 places per day (realistic pace)
-3. Prefer tourist attractions over residential areas
-4. Include timings and costs in {currency}
-5. Include all sections below
 
-OUTPUT FORMAT:
+# attractions offered to the model in structured mode
+MAX_PROMPT_ATTRACTIONS = 8
 
-## Day-wise Itinerary
-Day 1: [Morning/Afternoon/Evening activities]
-Day 2: ...
-[Continue for all {days} days]
 
-## Transport Plan
-- Inter-city: [mode and cost]
-- Local: [transport options]
+def structured_places(attractions: list, city_categories: dict, nearby_trips: dict) -> list:
+    """
+    Exactly the places build_structured_prompt lists, so validation
+    (utils/itinerary.py) only accepts places the model was shown.
+    """
+    return _all_places((attractions or [])[:MAX_PROMPT_ATTRACTIONS], city_categories, nearby_trips)
 
-## Estimated Budget Breakdown ({currency})
-- Transport: {currency} X-Y
-- Stay: {currency} X-Y
-- Food: {currency} X-Y
-- Activities: {currency} X-Y
-- Total: {currency} X-Y
 
-## Food Recommendations
-- 5 local dishes
-- 3 restaurants/areas
-- Budget + premium options
+def _all_places(attractions: list, city_categories: dict, nearby_trips: dict) -> list:
+    places = list(attractions or [])
+    for data in (city_categories, nearby_trips):
+        for v in (data or {}).values():
+            places.extend(v)
+    return list(dict.fromkeys(places))
 
-## Travel Tips
-- Best time to visit
-- Safety tips
-- Packing essentials
+
+def build_structured_prompt(
+    destination_full: str,
+    destination_city: str,
+    departure_full: str,
+    days: int,
+    budget: str,
+    currency: str,
+    travel_type: str,
+    transport_pref: str,
+    interests: list,
+    attractions: list,
+    city_categories: dict,
+    nearby_trips: dict,
+    travel_time_hint: str = "Not available",
+) -> str:
+    """
+    Same trip data as build_prompt, but asks for one JSON object per line
+    (one per day, one per section) so the output can be parsed while it
+    streams and validated day by day (see utils/itinerary.py).
+    Returns only the per-trip part; send it with system=STRUCTURED_PREFIX.
+    """
+
+    currency = (currency or "INR").strip().upper()
+    interests_text = ", ".join(interests) if interests else "General"
+
+    places_text = _format_list(
+        structured_places(attractions, city_categories, nearby_trips),
+        fallback="- Not available",
+    )
+
+    prompt = f"""TRIP DETAILS:
+- Destination: {destination_city}
+- Days: {days}
+- Departure: {departure_full}
+- Budget: {budget} | Transport: {transport_pref}
+- Travel type: {travel_type}
+- Interests: {interests_text}
+- Currency: {currency}
+- Travel time: {travel_time_hint}
+
+AVAILABLE PLACES:
+{places_text}
+"""
+    return prompt.strip()
+
+
+def build_repair_prompt(
+    destination_city: str,
+    days: int,
+    currency: str,
+    allowed_places: list,
+    used_places: list,
+    problems: list,
+) -> str:
+    """
+    Short follow-up prompt that regenerates only the failing days/sections
+    (sent with system=STRUCTURED_PREFIX, so the format is already known).
+    `problems` is a list of (key, reason) where key is a day number or a
+    section type ("food", "tips").
+    """
+
+    currency = (currency or "INR").strip().upper()
+    places_text = _format_list(allowed_places, fallback="- Not available")
+    used_text = ", ".join(used_places) if used_places else "None"
+
+    lines = []
+    for key, reason in problems:
+        if isinstance(key, int):
+            lines.append(f'- {{"type": "day", "day": {key}, ...}} -> {reason}')
+        else:
+            lines.append(f'- {{"type": "{key}", "items": [...]}} -> {reason}')
+    problems_text = "\n".join(lines)
+
+    prompt = f"""You are fixing parts of a {days}-day itinerary for {destination_city}.
+
+AVAILABLE PLACES:
+{places_text}
+
+ALREADY USED ON OTHER DAYS: {used_text}
+
+REWRITE ONLY THESE OBJECTS:
+{problems_text}
+
+RULES:
+1. Use ONLY places listed above, spelled exactly as listed
+2. 2-4 places per day, avoid places already used
+3. Costs in {currency}
+4. Output ONLY the JSON objects above, one per line, in the usual format
 """
-    return prompt.strip()
\ No newline at end of file
+    return prompt.strip()